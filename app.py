@@ -1,345 +1,2251 @@
 import os
 import re
 import io
-import base64
 import json
+import math
+import gzip
+import logging
+import hashlib
+import mimetypes
+import sqlite3
+import time
+import contextvars
+from bisect import bisect_left
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from flask import Flask, request, render_template_string
-from markupsafe import Markup
-from openai import OpenAI
+from functools import lru_cache
+from itertools import chain, islice
+import click
+from flask import Flask, Response, request, render_template, send_file, stream_with_context, url_for
+from markupsafe import Markup, escape
+from werkzeug.exceptions import RequestEntityTooLarge
+from openai import APIConnectionError, DefaultHttpxClient, InternalServerError, OpenAI, RateLimitError
+import httpx
+import queue
+import random
 import secrets
+import threading
+import zipfile
+import zlib
+from xml.sax.saxutils import escape as xml_escape
 import qrcode
 
-app = Flask(__name__)
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-TOKEN_FILE = "/tmp/resume_tokens.json"
+app = Flask(__name__)
 
-def load_tokens():
-    if os.path.exists(TOKEN_FILE):
+TOKEN_FILE = os.getenv("TOKEN_FILE", "/tmp/resume_tokens.json")  # legacy store, imported into TOKEN_DB on first start
+TOKEN_DB = os.getenv("TOKEN_DB", "/tmp/resume_tokens.sqlite3")
+# Seconds a positive token lookup is served from memory
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 30))
+
+_token_store = None
+_token_lock = threading.Lock()
+
+# Fingerprinted, pre-compressed static files and on-the-fly HTML/JSON compression
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+COMPRESSIBLE_TYPES = {"text/html", "text/plain", "application/json"}
+COMPRESS_MIN_SIZE = 1024
+
+# ATS scoring: bundled IDF/phrase/skill table; terms not in it weigh more than boilerplate, less than listed skills
+IDF_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ats_idf.tsv")
+DEFAULT_IDF = 2.5
+# Memoized tokenizations (job descriptions, resume text, bullets are tokenized several times per request)
+TEXT_CACHE_SIZE = int(os.getenv("TEXT_CACHE_SIZE", 1024))
+
+# Bulk scoring: resumes are scored in chunks across a process pool once a batch exceeds one chunk. The pool is
+# created once per server process and shared by all bulk requests; BULK_PROCESSES is split across SERVER_WORKERS.
+BULK_PROCESSES = int(os.getenv("BULK_PROCESSES", os.cpu_count() or 1))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 200))
+
+_bulk_pool = None
+_bulk_lock = threading.Lock()
+
+# Request size limits. A body over MAX_CONTENT_LENGTH bytes gets a 413 before it is read; the multipart parser
+# also stops at the first field over MAX_FORM_MEMORY_SIZE. Field caps (characters) are checked after parsing.
+MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 256 * 1024))  # 0 = no limit
+BULK_MAX_CONTENT_LENGTH = int(os.getenv("BULK_MAX_CONTENT_LENGTH", 1024 ** 3))  # /api/score streams many resumes
+JOB_DESC_MAX_CHARS = int(os.getenv("JOB_DESC_MAX_CHARS", 30_000))
+BULLETS_MAX_CHARS = int(os.getenv("BULLETS_MAX_CHARS", 10_000))  # all bullets of one role
+FIELD_MAX_CHARS = int(os.getenv("FIELD_MAX_CHARS", 300))  # name, email, company, role, ...
+# Drop benefits/EEO boilerplate from job descriptions before indexing and prompting
+STRIP_BOILERPLATE = os.getenv("STRIP_BOILERPLATE", "1") == "1"
+
+app.config.update(MAX_CONTENT_LENGTH=MAX_CONTENT_LENGTH or None,
+                  MAX_FORM_MEMORY_SIZE=4 * max(JOB_DESC_MAX_CHARS, BULLETS_MAX_CHARS))  # UTF-8: up to 4 bytes a character
+
+# UPI payment target shown on the paywall
+UPI_ID = "goodluckankur@okaxis"
+UPI_AMOUNT = "49.00"
+UPI_NOTE = "24-hour access"
+
+# Max in-flight LLM calls per role of an optimize() request, so a resume with more roles finishes in about as many
+# waves of calls as one with a single role; the global limiter (LLM_MAX_INFLIGHT) caps what a request can take
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+# Send summary + all bullets in one JSON-mode call instead of one call each
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "0") == "1"
+# Keep bullets that already follow the rewrite rules (strong verb, %, short, job keywords) without an LLM call
+BULLET_PREFILTER = os.getenv("BULLET_PREFILTER", "1") == "1"
+BULLET_MAX_WORDS = 25
+BULLET_MIN_KEYWORDS = 2
+# Bullet prompts carry only the job description sentences most relevant to the bullet:
+# at most PROMPT_EXCERPT_SENTENCES of them within PROMPT_EXCERPT_TOKENS (~4 characters per token)
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1") == "1"
+PROMPT_EXCERPT_SENTENCES = int(os.getenv("PROMPT_EXCERPT_SENTENCES", 5))
+PROMPT_EXCERPT_TOKENS = int(os.getenv("PROMPT_EXCERPT_TOKENS", 200))
+# Candidates per summary/bullet call (the API's n). Above 1, each part's candidates are scored locally and the
+# combination covering the most of the posting is kept, instead of appending missing keywords to the summary.
+LLM_CANDIDATES = int(os.getenv("LLM_CANDIDATES", 1))
+ATS_TARGET = 85
+# Roles per resume, and per-request budgets for the one workload all roles' bullets share: at most BULLET_BUDGET
+# rewrites and LLM_TOKEN_BUDGET estimated tokens (prompt + reply); bullets beyond either are kept as written (0 = none)
+MAX_ROLES = int(os.getenv("MAX_ROLES", 10))
+BULLET_BUDGET = int(os.getenv("BULLET_BUDGET", 40))
+LLM_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", 24_000))
+BULLET_PROMPT_CHARS = 400  # the bullet prompt without its bullet and job description text
+BULLET_REPLY_TOKENS = 40
+SUMMARY_TOKENS = 500
+
+# LLM backend: "openai" (default), "compatible" (any OpenAI-style server at LLM_BASE_URL)
+# or "fake" (in-process, deterministic text, simulated latency; for offline load tests)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0.5))
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", 0.0))
+FAKE_LLM_DISTRIBUTION = os.getenv("FAKE_LLM_DISTRIBUTION", "fixed")  # fixed|uniform|normal|lognormal|exponential
+FAKE_LLM_SEED = int(os.environ["FAKE_LLM_SEED"]) if os.getenv("FAKE_LLM_SEED") else None
+
+# Shared OpenAI client (connection pool, timeouts). LLM_MAX_RETRIES covers timeouts, connection errors and 5xx;
+# 429s are left to the limiter below (LLM_RATE_LIMIT_RETRIES).
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 32))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# Worker processes of one server (gunicorn.conf.py sets it). They split the in-flight LLM cap below; per-token
+# rate limits and last runs are shared through STATE_DB, a SQLite file every worker opens (none: per process).
+SERVER_WORKERS = max(1, int(os.getenv("SERVER_WORKERS", 1)))
+STATE_DB = os.getenv("STATE_DB") or None
+
+_state_local = threading.local()
+
+# Global cap on in-flight LLM calls across all requests and workers. It halves on a provider 429 and pauses for the
+# Retry-After time (or an exponential backoff), then grows back by one slot per `limit` successful calls.
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", LLM_POOL_SIZE))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 20))  # wait this long for a slot, then 429
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", 2))
+FAKE_LLM_CAPACITY = int(os.getenv("FAKE_LLM_CAPACITY", 0))  # fake provider answers 429 above this many calls; 0 = never
+
+# Per access token: sustained optimize requests per minute and burst size (0 disables).
+# A request just over the limit waits up to RATE_LIMIT_MAX_WAIT seconds; beyond that it gets a 429.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", 6))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 3))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 5))
+
+# LLM response cache: LRU size and TTL in memory, optional SQLite file for a persistent tier
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 4096))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB") or None
+
+# Last optimization per access token, so resubmits only regenerate edited bullets
+LAST_RUN_LIMIT = int(os.getenv("LAST_RUN_LIMIT", 1000))
+LAST_RUNS = OrderedDict()
+LAST_RUNS_LOCK = threading.Lock()
+
+# Background generation jobs: "memory" (per process) or "sqlite" (shared file, survives restarts)
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+JOB_DB = os.getenv("JOB_DB", "/tmp/resume_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", 100))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", 120))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+
+_job_store = None
+_job_workers_started = False
+_job_lock = threading.Lock()
+
+# Downloads (PDF, DOCX, Markdown) of optimized resumes. Each result is stored under its content hash and rendered by
+# a small background pool, eagerly with EXPORT_PREFETCH, into files that later downloads just read. Files are
+# shared by the processes of one host and removed EXPORT_TTL seconds after their last use. Empty EXPORT_DIR disables.
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/tmp/resume_exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+EXPORT_TTL = int(os.getenv("EXPORT_TTL", 24 * 3600))
+EXPORT_TIMEOUT = float(os.getenv("EXPORT_TIMEOUT", 30))
+EXPORT_PREFETCH = os.getenv("EXPORT_PREFETCH", "1") == "1"
+EXPORT_FORMATS = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "md": "text/markdown",
+}
+
+_export_pool = None
+_export_futures = {}
+_export_lock = threading.Lock()
+_export_swept = 0.0
+
+# Per-stage latency histograms (seconds) and LLM usage counters, served on /metrics. With METRICS_DIR each worker
+# process writes its metrics there every METRICS_FLUSH_INTERVAL seconds and /metrics adds up all the files.
+# TIMING_LOG=1 also logs one JSON line of stage timings per pipeline request.
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TIMING_LOG = os.getenv("TIMING_LOG", "0") == "1"
+METRICS_KEY = os.getenv("METRICS_KEY") or None  # require "Authorization: Bearer <key>" on /metrics
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+# USD per million tokens for the cost counter (defaults: gpt-4o-mini list price)
+LLM_PRICE_INPUT = float(os.getenv("LLM_PRICE_INPUT", 0.15))
+LLM_PRICE_OUTPUT = float(os.getenv("LLM_PRICE_OUTPUT", 0.60))
+
+METRICS = Counter()
+STAGE_TIMES = {}  # stage -> [observations per bucket..., +Inf, sum of seconds]
+METRICS_LOCK = threading.Lock()
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+timing_logger = logging.getLogger("resume_optimizer.timing")
+if TIMING_LOG:
+    timing_logger.setLevel(logging.INFO)
+    timing_logger.addHandler(logging.StreamHandler())
+    timing_logger.propagate = False
+
+class TokenStore:
+    # Access tokens in SQLite (WAL): primary-key lookups, atomic inserts, expiry index for purging
+    def __init__(self, path, cache_ttl):
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+        self.local = threading.local()
+        db = self.db()
+        db.execute("CREATE TABLE IF NOT EXISTS tokens (token TEXT PRIMARY KEY, expires TEXT NOT NULL) WITHOUT ROWID")
+        db.execute("CREATE INDEX IF NOT EXISTS tokens_expires ON tokens (expires)")
+        self.import_json(TOKEN_FILE)
+
+    def db(self):
+        if not hasattr(self.local, "conn"):
+            self.local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self.local.conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn.execute("PRAGMA synchronous=NORMAL")
+        return self.local.conn
+
+    def import_json(self, path):
+        # One-time migration from the old JSON token file. Another process may be importing it at the same time:
+        # whichever renames it second finds it gone, and the inserts are idempotent.
+        if not os.path.exists(path):
+            return
         try:
-            with open(TOKEN_FILE, "r") as f:
-                return json.load(f)
+            with open(path, "r") as f:
+                tokens = json.load(f)
         except:
-            return {}
-    return {}
+            return
+        self.db().executemany("INSERT OR IGNORE INTO tokens VALUES (?, ?)", tokens.items())
+        try:
+            os.replace(path, path + ".imported")
+        except FileNotFoundError:
+            pass
 
-def save_tokens(tokens):
-    with open(TOKEN_FILE, "w") as f:
-        json.dump(tokens, f)
+    def add(self, token, expires):
+        db = self.db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO tokens VALUES (?, ?)", (token, expires))
+            db.execute("DELETE FROM tokens WHERE expires < ?", (datetime.utcnow().isoformat(),))
+        finally:
+            db.execute("COMMIT")
+
+    def expiry(self, token):
+        now = time.time()
+        with self.cache_lock:
+            hit = self.cache.get(token)
+        if hit and hit[1] > now:
+            return hit[0]
+        row = self.db().execute("SELECT expires FROM tokens WHERE token = ?", (token,)).fetchone()
+        if row:
+            with self.cache_lock:
+                if len(self.cache) >= 10000:
+                    self.cache.clear()
+                self.cache[token] = (row[0], now + self.cache_ttl)
+            return row[0]
+        return None
+
+    def is_valid(self, token):
+        expires = self.expiry(token)
+        return expires is not None and datetime.utcnow().isoformat() < expires
+
+def get_token_store():
+    global _token_store
+    if _token_store is None:
+        with _token_lock:
+            if _token_store is None:
+                _token_store = TokenStore(TOKEN_DB, TOKEN_CACHE_TTL)
+    return _token_store
 
 def is_access_valid():
     token = request.args.get('token')
     if not token:
         return False
-    tokens = load_tokens()
-    if token in tokens:
-        expiry = tokens[token]
-        if datetime.utcnow().isoformat() < expiry:
-            return True
-    return False
+    return get_token_store().is_valid(token)
 
-def get_ai_response(prompt, model="gpt-4o-mini"):
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-    )
-    return response.choices[0].message.content.strip()
+class RateLimited(Exception):
+    # A request or LLM call over a rate limit; retry_after is in seconds
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
 
+def retry_after_seconds(headers):
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1)):
+        try:
+            return float(headers.get(name)) * scale
+        except (TypeError, ValueError):
+            pass
+    return None
+
+def incr(name, amount=1):
+    with METRICS_LOCK:
+        METRICS[name] += amount
+
+class RequestTimings:
+    # Stage timings, LLM usage and input sizes of one request, for the TIMING_LOG line
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = None
+        self.stages = {}
+        self.usage = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages.setdefault(stage, []).append(round(seconds * 1000, 1))
+
+    def add_usage(self, prompt_tokens, completion_tokens, cost):
+        with self.lock:
+            self.usage.update(llm_prompt_tokens=prompt_tokens, llm_completion_tokens=completion_tokens, llm_cost_usd=cost)
+
+    def count(self, **values):
+        with self.lock:
+            self.usage.update(values)
+
+def observe(stage, seconds):
+    with METRICS_LOCK:
+        hist = STAGE_TIMES.get(stage)
+        if hist is None:
+            hist = STAGE_TIMES[stage] = [0] * (len(STAGE_BUCKETS) + 1) + [0.0]
+        hist[bisect_left(STAGE_BUCKETS, seconds)] += 1
+        hist[-1] += seconds
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def record_usage(prompt_tokens, completion_tokens):
+    cost = (prompt_tokens * LLM_PRICE_INPUT + completion_tokens * LLM_PRICE_OUTPUT) / 1_000_000
+    with METRICS_LOCK:
+        METRICS.update(llm_prompt_tokens=prompt_tokens, llm_completion_tokens=completion_tokens, llm_cost_usd=cost)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add_usage(prompt_tokens, completion_tokens, cost)
+
+def _trace_connection(event, info):
+    if event == "connection.connect_tcp.complete":
+        incr("llm_connections_opened")
+
+def _on_llm_request(req):
+    incr("llm_http_requests")
+    req.extensions["trace"] = _trace_connection
+
+def _on_llm_response(resp):
+    if resp.status_code == 429 or resp.status_code >= 500:
+        incr("llm_http_retryable_errors")
+
+class OpenAIBackend:
+    # OpenAI API, or any OpenAI-compatible server (vLLM, llama.cpp, stub_llm.py) when base_url is set.
+    # One instance per process: its keep-alive pool is shared by all worker threads.
+    def __init__(self, api_key, base_url=None):
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_POOL_SIZE,
+                max_keepalive_connections=LLM_POOL_SIZE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            event_hooks={"request": [_on_llm_request], "response": [_on_llm_response]},
+        )
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            max_retries=0,
+            http_client=http_client,
+        )
+        incr("llm_client_setups")
+
+    def create(self, **params):
+        # The SDK retries nothing: a 429 goes straight to the limiter (limited_call), which backs off and
+        # retries. Timeouts, connection errors and 5xx are retried here, like the SDK would.
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                return self.client.chat.completions.create(**params)
+            except RateLimitError as e:
+                raise RateLimited("The AI provider is rate limiting requests.", retry_after_seconds(e.response.headers))
+            except (APIConnectionError, InternalServerError):
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                incr("llm_retries")
+                time.sleep(min(0.5 * 2 ** attempt, 8) * random.uniform(0.75, 1))
+
+    def complete(self, prompt, model, temperature, json_mode=False, n=1):
+        # One string, or a list of n candidates sampled in the same call when n > 1
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        if n > 1:
+            extra["n"] = n
+        response = self.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            **extra,
+        )
+        if response.usage:
+            record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        if n > 1:
+            return [(choice.message.content or "").strip() for choice in response.choices]
+        return response.choices[0].message.content.strip()
+
+    def stream(self, prompt, model, temperature):
+        stream = self.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.usage:
+                record_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+class FakeBackend:
+    # Deterministic in-process LLM for offline load tests: the text depends only on the prompt,
+    # the latency is drawn from a configurable distribution. With a capacity, calls beyond that
+    # many in flight fail like a provider 429.
+    def __init__(self, latency, jitter=0.0, distribution="fixed", seed=None, capacity=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.random = random.Random(seed)
+        self.capacity = capacity
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def admit(self):
+        with self.lock:
+            if self.capacity and self.in_flight >= self.capacity:
+                incr("fake_llm_rejections")
+                raise RateLimited("Fake provider is over capacity.", max(self.latency, 0.05))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def delay(self):
+        with self.lock:
+            if self.distribution == "uniform":
+                seconds = self.random.uniform(self.latency - self.jitter, self.latency + self.jitter)
+            elif self.distribution == "normal":
+                seconds = self.random.gauss(self.latency, self.jitter)
+            elif self.distribution == "lognormal":
+                # latency is the median, jitter the log-space sigma: a long right tail like real APIs
+                seconds = self.latency * self.random.lognormvariate(0, self.jitter)
+            elif self.distribution == "exponential":
+                seconds = self.random.expovariate(1 / self.latency) if self.latency > 0 else 0
+            else:
+                seconds = self.latency
+        return max(0.0, seconds)
+
+    def complete(self, prompt, model, temperature, json_mode=False, n=1):
+        with self.admit():
+            time.sleep(self.delay())
+        contents = [fake_completion(prompt, json_mode, variant) for variant in range(n)]
+        record_usage(len(prompt) // 4, sum(len(c) for c in contents) // 4)  # ~4 characters per token, like stub_llm.py
+        return contents if n > 1 else contents[0]
+
+    def stream(self, prompt, model, temperature):
+        with self.admit():
+            content = fake_completion(prompt)
+            record_usage(len(prompt) // 4, len(content) // 4)
+            words = content.split(" ")
+            pause = self.delay() / len(words)
+            for i, word in enumerate(words):
+                time.sleep(pause)
+                yield word if i == 0 else " " + word
+
+def fake_completion(prompt, json_mode=False, variant=0):
+    # Plausible, prompt-derived output for the summary, bullet and batch prompts;
+    # other variants (the n candidates of one call) use different job keywords
+    seed = prompt if not variant else f"{prompt}\0{variant}"
+    pct = 10 + int(hashlib.sha256(seed.encode()).hexdigest()[:8], 16) % 40
+    job_desc = re.search(r"Job description: (.*)", prompt)
+    keywords = job_index(job_desc.group(1)).top_terms(3 + variant)[variant:] if job_desc else []
+    listed = re.search(r"keywords from the job description: (.*)\.", prompt)
+    if listed:
+        keywords = [k.strip() for k in listed.group(1).split(",") if k.strip()][variant:variant + 3] or keywords
+    keywords = (keywords + ["cross-team delivery", "automation", "quality"])[:3]
+
+    def bullet(original):
+        return f"Delivered {original.rstrip('.')} using {keywords[0]} and {keywords[1]}, improving results by {pct}%."
+
+    if json_mode:
+        title = re.search(r"summary for an? (.+?)\.\n", prompt)
+        numbered = re.findall(r"^\s*(\d+)\. (.*)$", prompt.split("Bullets:")[-1].split("Return ONLY")[0], re.M)
+        return json.dumps({
+            "summary": fake_summary(title.group(1) if title else "Professional", keywords, pct),
+            "bullets": [{"index": int(i), "text": bullet(text)} for i, text in numbered],
+        })
+    original = re.search(r'Original: "(.*)"', prompt)
+    if original:
+        return bullet(original.group(1))
+    title = re.search(r"summary for an? (.+?)\.\n", prompt)
+    return fake_summary(title.group(1) if title else "Professional", keywords, pct)
+
+def fake_summary(title, keywords, pct):
+    return (f"{title} with hands-on experience in {', '.join(keywords)}. "
+            f"Improved delivery efficiency by {pct}% through {keywords[0]}. "
+            f"Known for measurable results and clear communication.")
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if LLM_BACKEND == "fake":
+                    _backend = FakeBackend(FAKE_LLM_LATENCY, FAKE_LLM_JITTER, FAKE_LLM_DISTRIBUTION, FAKE_LLM_SEED,
+                                           FAKE_LLM_CAPACITY)
+                elif LLM_BACKEND == "compatible":
+                    if not LLM_BASE_URL:
+                        raise ValueError("LLM_BASE_URL must be set for LLM_BACKEND=compatible")
+                    _backend = OpenAIBackend(os.getenv("LLM_API_KEY") or "not-needed", LLM_BASE_URL)
+                else:
+                    _backend = OpenAIBackend(os.getenv("OPENAI_API_KEY"), OPENAI_BASE_URL)
+    return _backend
+
+def with_derived_metrics(stats):
+    opened = stats.get("llm_connections_opened", 0)
+    stats["llm_connections_reused"] = max(0, stats.get("llm_http_requests", 0) - opened)
+    return stats
+
+def metrics_snapshot():
+    # This process's counters
+    with METRICS_LOCK:
+        stats = dict(METRICS)
+    return with_derived_metrics(stats)
+
+def process_metrics():
+    with METRICS_LOCK:
+        return {"updated": time.time(), "counters": dict(METRICS),
+                "stages": {stage: list(hist) for stage, hist in STAGE_TIMES.items()},
+                "gauges": {"llm_concurrency_limit": int(llm_limiter.limit), "llm_in_flight": llm_limiter.in_flight}}
+
+def flush_metrics():
+    write_atomic(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), json.dumps(process_metrics()).encode())
+
+def metrics_flusher():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush_metrics()
+        except OSError as e:
+            app.logger.warning("Could not write metrics: %s", e)
+
+def server_metrics():
+    # (counters, stage histograms, gauges) of every worker process. Files of exited workers still count towards
+    # the counters, so they never go backwards; their gauges are left out once the files go stale.
+    if not METRICS_DIR:
+        state = process_metrics()
+        return with_derived_metrics(state["counters"]), state["stages"], state["gauges"]
+    flush_metrics()
+    counters, stages, gauges = Counter(), {}, Counter()
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        counters.update(state["counters"])
+        for stage, hist in state["stages"].items():
+            stages[stage] = [a + b for a, b in zip(stages.get(stage, [0] * len(hist)), hist)]
+        if state["updated"] > time.time() - 3 * METRICS_FLUSH_INTERVAL:
+            gauges.update(state["gauges"])
+    return with_derived_metrics(dict(counters)), stages, dict(gauges)
+
+class ResponseCache:
+    # In-memory LRU with TTL, optionally backed by SQLite so entries survive restarts
+    def __init__(self, max_entries, ttl, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.db_path = db_path
+        self.db = None
+        self.db_pid = None
+        self.writes = 0
+
+    def connection(self):
+        # Opened on first use in each process, so forked server workers never share a SQLite handle
+        if self.db_path and self.db_pid != os.getpid():
+            self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self.db.commit()
+            self.db_pid = os.getpid()
+        return self.db
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    incr("llm_cache_hits")
+                    return entry[1]
+                del self.entries[key]
+            db = self.connection()
+            if db:
+                row = db.execute("SELECT value, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    incr("llm_cache_hits")
+                    incr("llm_cache_disk_hits")
+                    return row[0]
+        incr("llm_cache_misses")
+        return None
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, value, expires)
+            db = self.connection()
+            if db:
+                db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, value, expires))
+                self.writes += 1
+                if self.writes % 256 == 0:
+                    db.execute("DELETE FROM llm_cache WHERE expires < ?", (time.time(),))
+                db.commit()
+
+    def _remember(self, key, value, expires):
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            incr("llm_cache_evictions")
+
+def cache_key(prompt, model, temperature, json_mode, n=1):
+    normalized = " ".join(prompt.split())
+    candidates = f"\0n={n}" if n > 1 else ""
+    return hashlib.sha256(f"{model}\0{temperature}\0{json_mode}{candidates}\0{normalized}".encode()).hexdigest()
+
+llm_cache = ResponseCache(LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_DB) if LLM_CACHE_SIZE > 0 else None
+
+class AdaptiveLimiter:
+    # Shared slots for in-flight LLM calls (AIMD: halve on a 429, add one slot per `limit` successes)
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff = LLM_BACKOFF_BASE
+        self.cond = threading.Condition()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                paused = self.paused_until - now
+                if paused <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                if now >= deadline:
+                    incr("llm_limiter_timeouts")
+                    raise RateLimited("Too many AI requests in progress, please retry shortly.", max(paused, 1))
+                self.cond.wait(min(deadline - now, paused) if paused > 0 else deadline - now)
+
+    def release(self, ok=True):
+        with self.cond:
+            self.in_flight -= 1
+            if ok:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.backoff = LLM_BACKOFF_BASE
+            self.cond.notify_all()
+
+    def throttled(self, retry_after=None):
+        # Several calls failing together count as one signal: halve once per pause window
+        with self.cond:
+            now = time.monotonic()
+            if now >= self.paused_until:
+                self.limit = max(self.min_limit, self.limit / 2)
+                incr("llm_limiter_backoffs")
+            self.paused_until = max(self.paused_until, now + (retry_after or self.backoff))
+            self.backoff = min(self.backoff * 2, LLM_BACKOFF_MAX)
+
+llm_limiter = AdaptiveLimiter(max(1, LLM_MAX_INFLIGHT // SERVER_WORKERS))
+
+def limited_call(fn):
+    # One backend call under the global limiter; a provider 429 backs the limiter off and is retried
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        llm_limiter.acquire(LLM_QUEUE_TIMEOUT)
+        try:
+            result = fn()
+        except RateLimited as e:
+            llm_limiter.release(ok=False)
+            llm_limiter.throttled(e.retry_after)
+            if attempt == LLM_RATE_LIMIT_RETRIES:
+                raise
+            incr("llm_rate_limit_retries")
+            continue
+        except Exception:
+            llm_limiter.release(ok=False)
+            raise
+        llm_limiter.release()
+        return result
+
+def state_db():
+    # One STATE_DB connection per thread and process, in autocommit mode (callers open their own transactions)
+    if getattr(_state_local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(STATE_DB, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS last_runs (token TEXT PRIMARY KEY, run TEXT, updated REAL)")
+        _state_local.conn, _state_local.pid = conn, os.getpid()
+    return _state_local.conn
+
+class TokenBuckets:
+    # One token bucket per access token: `rate` requests per second sustained, up to `burst` at once.
+    # Callers over the limit reserve a future slot (the bucket goes negative), so waiters are served in order.
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> (tokens, monotonic time of last update)
+        self.lock = threading.Lock()
+
+    def spend(self, tokens, updated, now, max_wait):
+        # Refills the bucket since its last update and takes one token unless the wait would exceed max_wait
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+        if wait <= max_wait:
+            tokens -= 1
+        return tokens, wait
+
+    def take(self, key, max_wait):
+        now = time.monotonic()
+        with self.lock:
+            tokens, wait = self.spend(*self.buckets.get(key, (self.burst, now)), now, max_wait)
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def reserve(self, key, max_wait):
+        # Seconds to wait before going ahead (0 = now); raises RateLimited if that exceeds max_wait
+        wait = self.take(key, max_wait)
+        if wait > max_wait:
+            incr("rate_limit_rejections")
+            raise RateLimited("Too many requests for this access link, please retry shortly.", wait)
+        return wait
+
+class SqliteTokenBuckets(TokenBuckets):
+    # The same buckets as rows of STATE_DB, so all worker processes see one budget per access token
+    def __init__(self, rate, burst):
+        super().__init__(rate, burst)
+        self.writes = 0
+
+    def take(self, key, max_wait):
+        now = time.time()
+        db = state_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key or "",)).fetchone()
+            tokens, wait = self.spend(*(row or (self.burst, now)), now, max_wait)
+            db.execute("INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?)", (key or "", tokens, now))
+            self.writes += 1
+            if self.writes % 256 == 0:
+                # Buckets that have refilled completely are the same as no bucket
+                db.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.burst / self.rate,))
+        finally:
+            db.execute("COMMIT")
+        return wait
+
+if RATE_LIMIT_PER_MINUTE <= 0:
+    token_buckets = None
+elif STATE_DB:
+    token_buckets = SqliteTokenBuckets(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+else:
+    token_buckets = TokenBuckets(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+
+def throttle_token():
+    # Per-token request rate for the paid routes: short waits are queued, longer ones raise RateLimited
+    if token_buckets is None:
+        return
+    wait = token_buckets.reserve(request.args.get('token'), RATE_LIMIT_MAX_WAIT)
+    if wait:
+        incr("rate_limit_queued")
+        with timed("rate_limit_wait"):
+            time.sleep(wait)
+
+def get_ai_response(prompt, model=None, json_mode=False, temperature=0.7, use_cache=True, stage="llm", n=1):
+    # use_cache=False skips the lookup for callers that want a fresh sample (the result is still stored).
+    # stage names the latency histogram the backend call is recorded under; n > 1 returns a list of candidates.
+    model = model or LLM_MODEL
+    key = cache_key(prompt, model, temperature, json_mode, n) if llm_cache else None
+    if key and use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return json.loads(cached) if n > 1 else cached
+    incr("llm_calls")
+    try:
+        with timed(stage):
+            content = limited_call(lambda: get_backend().complete(prompt, model, temperature, json_mode, n))
+    except Exception:
+        incr("llm_errors")
+        raise
+    if key:
+        llm_cache.set(key, json.dumps(content) if n > 1 else content)
+    return content
+
+def stream_ai_response(prompt, model=None, temperature=0.7, use_cache=True, stage="llm"):
+    # Yields the completion in chunks as the API produces them; a cache hit is yielded whole
+    model = model or LLM_MODEL
+    key = cache_key(prompt, model, temperature, False) if llm_cache else None
+    if key and use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    incr("llm_calls")
+    parts = []
+    try:
+        with timed(stage):
+            yield from stream_limited(get_backend(), prompt, model, temperature, parts)
+    except Exception:
+        incr("llm_errors")
+        raise
+    if key:
+        llm_cache.set(key, "".join(parts).strip())
+
+def stream_limited(backend, prompt, model, temperature, parts):
+    # limited_call() for streams: the slot is held until the stream ends; a 429 is only retried
+    # before the first chunk, since chunks already yielded cannot be taken back
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        llm_limiter.acquire(LLM_QUEUE_TIMEOUT)
+        ok = False
+        try:
+            for delta in backend.stream(prompt, model, temperature):
+                parts.append(delta)
+                yield delta
+            ok = True
+            return
+        except RateLimited as e:
+            llm_limiter.throttled(e.retry_after)
+            if parts or attempt == LLM_RATE_LIMIT_RETRIES:
+                raise
+            incr("llm_rate_limit_retries")
+        finally:
+            llm_limiter.release(ok)
+
+# ===== ATS SCORING =====
+# Words of three characters or more, plus the two-character terms that are real skills. A word right after an
+# apostrophe is a contraction ending ("you'll", "we're"), never a keyword; the part before it is a stop word.
+SHORT_TERMS = frozenset("ai ml qa ui ux bi js ts go c# ci cd hr pr ar vr os db ip io".split())
+WORD_RE = re.compile(r"(?<![a-z0-9+#'’])[a-z][a-z0-9+#]+")
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each either etc few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own per same she should
+so some such than that the their theirs them themselves then there these they this those through to too
+under until up upon very via was we were what when where which while who whom why will with within without
+would you your yours yourself yourselves
+us let lets know get gets getting got going want wants way ways one two every everyone everything someone
+something anyone anything really lot lots love hear excited worry sure yes ask come feel bring used
+don isn aren wasn weren doesn didn hasn haven hadn shouldn wouldn couldn
+""".split())
+
+def load_idf_table(path):
+    table = {}
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                term, idf = line.rstrip("\n").split("\t")
+                table[term] = float(idf)
+    return table
+
+IDF = load_idf_table(IDF_TABLE)
+
+def tokenize(text):
+    return [w for w in WORD_RE.findall(text.lower()) if len(w) > 2 or w in SHORT_TERMS]
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def cached_tokens(text):
+    return tuple(tokenize(text))
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
 def extract_keywords(text):
-    return set(re.findall(r'\b[a-zA-Z]{3,}\b', text.lower()))
+    return frozenset(cached_tokens(text)).difference(STOP_WORDS)
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+WRAPPED_LINE_RE = re.compile(r"(?<=[^.!?:\n])\n(?=[a-z])")  # hard-wrapped line continuing a sentence
+
+class JobIndex:
+    # Weighted keywords of one job description; build once, then score any number of resumes.
+    # Terms get integer IDs in rank order (heaviest first), and a text is reduced to a bitset of the
+    # IDs it contains, so matching, coverage and missing terms are integer operations.
+    def __init__(self, job_desc):
+        self.job_desc = job_desc
+        self._sentences = None
+        words = cached_tokens(job_desc)
+        # Distinct words and word pairs first, so lookups and stop word checks run once per term, not per occurrence
+        self.weights = {w: IDF.get(w, DEFAULT_IDF) for w in extract_keywords(job_desc)}
+        # Phrases: known multi-word skills, or any pair the posting repeats
+        for (a, b), count in Counter(zip(words, words[1:])).items():
+            if a in STOP_WORDS or b in STOP_WORDS:
+                continue
+            phrase = f"{a} {b}"
+            if count >= 2 or phrase in IDF:
+                self.weights[phrase] = IDF.get(phrase, (self.weights[a] + self.weights[b]) / 2)
+        self.terms = sorted(self.weights, key=self.rank)
+        self.term_weights = [self.weights[t] for t in self.terms]
+        self.word_ids = {t: i for i, t in enumerate(self.terms) if " " not in t}
+        # Phrases are matched as word pairs, without building a string per pair of the text
+        self.phrase_ids = {tuple(t.split(" ")): i for i, t in enumerate(self.terms) if " " in t}
+        self.all_terms = (1 << len(self.terms)) - 1
+        self.total = sum(self.term_weights)
+
+    def mask(self, text):
+        return self.mask_words(cached_tokens(text))
+
+    def mask_words(self, words):
+        word_ids, phrase_ids = self.word_ids, self.phrase_ids
+        found = {word_ids[w] for w in words if w in word_ids}
+        if phrase_ids:
+            found.update(phrase_ids[pair] for pair in zip(words, words[1:]) if pair in phrase_ids)
+        mask = 0
+        for i in found:
+            mask |= 1 << i
+        return mask
+
+    def weight(self, mask):
+        weights, total = self.term_weights, 0.0
+        while mask:
+            low = mask & -mask
+            total += weights[low.bit_length() - 1]
+            mask ^= low
+        return total
+
+    def terms_of(self, mask, limit=None):
+        # Terms in the bitset, heaviest first
+        terms = []
+        while mask and (limit is None or len(terms) < limit):
+            low = mask & -mask
+            terms.append(self.terms[low.bit_length() - 1])
+            mask ^= low
+        return terms
+
+    def terms_in(self, resume_text):
+        # Only terms the job description cares about are kept
+        return set(self.terms_of(self.mask(resume_text)))
+
+    def score_mask(self, mask):
+        if not self.total:
+            return 100
+        return min(100, int((self.weight(mask) / self.total) * 100))
+
+    def score(self, resume_text):
+        return self.score_mask(self.mask(resume_text))
+
+    def score_many(self, resume_texts):
+        # Batch mode: one job index, one pass per resume
+        return [self.score_mask(self.mask_words(tokenize(text))) for text in resume_texts]
+
+    def report(self, resume_text, limit=20):
+        # Score plus matched/missing terms (heaviest first) from a single tokenization.
+        # Bulk scoring sees every text once, so it skips the tokenization memo.
+        mask = self.mask_words(tokenize(resume_text))
+        return self.score_mask(mask), self.terms_of(mask), self.terms_of(self.all_terms & ~mask, limit)
+
+    def missing(self, resume_text, limit=None):
+        return self.terms_of(self.all_terms & ~self.mask(resume_text), limit)
+
+    def top_terms(self, limit):
+        return self.terms[:limit]
+
+    def sentences(self):
+        # [(sentence, terms)] in posting order without repeats; built on first use since bulk scoring never needs it
+        if self._sentences is None:
+            text = WRAPPED_LINE_RE.sub(" ", self.job_desc)
+            parts = (part.strip().lstrip("-•*").strip() for part in SENTENCE_SPLIT_RE.split(text))
+            unique = dict.fromkeys(part for part in parts if part)
+            self._sentences = [(part, self.mask_words(tokenize(part))) for part in unique]
+        return self._sentences
+
+    def excerpt(self, text, limit, budget_chars):
+        # The sentences sharing the most term weight with text, kept in posting order. Ties (and text
+        # with no overlap at all) go to sentences carrying the posting's top terms.
+        if len(self.job_desc) <= budget_chars:
+            return self.job_desc
+        wanted, top = self.mask(text), (1 << 20) - 1  # IDs are in rank order: the top 20 terms are the low bits
+        sentences = self.sentences()
+        ranked = sorted(range(len(sentences)), key=lambda pos: (
+            -self.weight(sentences[pos][1] & wanted),
+            -self.weight(sentences[pos][1] & top),
+            pos))
+        picked, used = [], 0
+        for pos in ranked:
+            if len(picked) == limit:
+                break
+            if used + len(sentences[pos][0]) <= budget_chars:
+                picked.append(pos)
+                used += len(sentences[pos][0]) + 1
+        return " ".join(sentences[pos][0] for pos in sorted(picked))
+
+    def rank(self, term):
+        # Heaviest first, alphabetical among equals so output is stable across processes
+        return -self.weights[term], term
+
+@lru_cache(maxsize=256)
+def job_index(job_desc):
+    # One index per job description, shared by the summary prompt and both ATS passes
+    return JobIndex(job_desc)
 
 def calculate_ats_score(job_desc, resume_text):
-    job_kw = extract_keywords(job_desc)
-    res_kw = extract_keywords(resume_text)
-    if not job_kw:
-        return 100
-    return min(100, int((len(job_kw & res_kw) / len(job_kw)) * 100))
-
-# ===== HTML TEMPLATE =====
-HTML = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-  <meta charset="UTF-8" />
-  <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
-  <title>ResumeTailor · AI-Powered ATS Optimizer</title>
-  <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-  <style>
-    :root {
-      --primary: #6366f1;
-      --primary-dark: #4f46e5;
-      --success: #10b981;
-      --light: #f9fafb;
-      --dark: #111827;
-      --gray: #6b7280;
-      --border: #e5e7eb;
-      --shadow: 0 10px 25px -5px rgba(0,0,0,0.1);
-      --radius: 16px;
-    }
-
-    * {
-      margin: 0;
-      padding: 0;
-      box-sizing: border-box;
-    }
-
-    body {
-      font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-      background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
-      color: var(--dark);
-      line-height: 1.6;
-      min-height: 100vh;
-      padding: 20px;
-    }
-
-    .container {
-      max-width: 850px;
-      margin: 0 auto;
-    }
-
-    header {
-      text-align: center;
-      padding: 40px 20px 30px;
-    }
-
-    .logo {
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      gap: 12px;
-      margin-bottom: 16px;
-    }
-
-    .logo-icon {
-      background: linear-gradient(135deg, var(--primary), #8b5cf6);
-      width: 48px;
-      height: 48px;
-      border-radius: 14px;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      color: white;
-      font-size: 20px;
-      box-shadow: var(--shadow);
-    }
-
-    h1 {
-      font-size: 2.5rem;
-      font-weight: 800;
-      background: linear-gradient(to right, #1e40af, #7c3aed);
-      -webkit-background-clip: text;
-      background-clip: text;
-      color: transparent;
-      margin-bottom: 12px;
-    }
-
-    .subtitle {
-      font-size: 1.1rem;
-      color: var(--gray);
-      max-width: 600px;
-      margin: 0 auto;
-    }
-
-    .card {
-      background: white;
-      border-radius: var(--radius);
-      box-shadow: var(--shadow);
-      overflow: hidden;
-      margin-bottom: 30px;
-    }
-
-    .card-header {
-      padding: 24px 32px;
-      background: #f8fafc;
-      border-bottom: 1px solid var(--border);
-    }
-
-    .card-title {
-      font-size: 1.4rem;
-      font-weight: 700;
-      color: var(--dark);
-      display: flex;
-      align-items: center;
-      gap: 10px;
-    }
-
-    .card-body {
-      padding: 32px;
-    }
-
-    .form-group {
-      margin-bottom: 24px;
-    }
-
-    label {
-      display: flex;
-      align-items: center;
-      gap: 8px;
-      font-weight: 600;
-      margin-bottom: 10px;
-      color: var(--dark);
-    }
-
-    input, textarea {
-      width: 100%;
-      padding: 16px;
-      border: 2px solid var(--border);
-      border-radius: 12px;
-      font-size: 16px;
-      font-family: inherit;
-      transition: all 0.3s ease;
-      background: #fafbff;
-    }
-
-    textarea {
-      resize: vertical;
-      min-height: 100px;
-    }
-
-    input:focus, textarea:focus {
-      outline: none;
-      border-color: var(--primary);
-      box-shadow: 0 0 0 4px rgba(99, 102, 241, 0.2);
-    }
-
-    .btn {
-      background: linear-gradient(135deg, var(--primary-dark), #7c3aed);
-      color: white;
-      border: none;
-      padding: 16px 32px;
-      font-size: 18px;
-      font-weight: 700;
-      border-radius: 12px;
-      cursor: pointer;
-      transition: all 0.3s ease;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      gap: 10px;
-      width: 100%;
-      box-shadow: 0 4px 15px rgba(99, 102, 241, 0.3);
-    }
-
-    .btn:hover {
-      transform: translateY(-2px);
-      box-shadow: 0 6px 20px rgba(99, 102, 241, 0.4);
-    }
-
-    .error {
-      background: #f8fafc;
-      border: 1px solid #e2e8f0;
-      border-radius: 16px;
-      padding: 25px;
-      margin: 25px 0;
-    }
-
-    .result-card {
-      background: linear-gradient(135deg, #f0fdf4, #dcfce7);
-      border: 2px solid #bbf7d0;
-      border-radius: var(--radius);
-      padding: 28px;
-      margin-top: 20px;
-      animation: fadeIn 0.5s ease;
-    }
-
-    @keyframes fadeIn {
-      from { opacity: 0; transform: translateY(10px); }
-      to { opacity: 1; transform: translateY(0); }
-    }
-
-    .ats-meter {
-      display: flex;
-      align-items: center;
-      gap: 16px;
-      margin-bottom: 24px;
-    }
-
-    .score-badge {
-      background: white;
-      color: var(--success);
-      font-weight: 800;
-      font-size: 1.8rem;
-      padding: 12px 24px;
-      border-radius: 16px;
-      box-shadow: 0 4px 12px rgba(16, 185, 129, 0.2);
-      min-width: 120px;
-      text-align: center;
-    }
-
-    .score-label {
-      font-size: 1.1rem;
-      font-weight: 600;
-      color: #065f46;
-    }
-
-    .keywords {
-      font-size: 0.95rem;
-      color: var(--gray);
-      background: rgba(16, 185, 129, 0.1);
-      padding: 6px 12px;
-      border-radius: 20px;
-      display: inline-block;
-    }
+    return job_index(job_desc).score(resume_text)
+
+# ===== BULLET RULES =====
+STRONG_VERBS = frozenset("""
+accelerated achieved architected automated boosted built consolidated created cut decreased delivered deployed
+designed developed directed doubled drove eliminated engineered established expanded generated grew halved
+implemented improved increased initiated introduced launched led mentored migrated modernized negotiated optimized
+orchestrated overhauled pioneered produced reduced refactored resolved restructured revamped saved scaled secured
+shipped simplified spearheaded standardized streamlined transformed tripled upgraded
+""".split())
+
+PERCENT_RE = re.compile(r"\d+(?:\.\d+)?\s?%")
+
+def bullet_is_compliant(bullet, keywords):
+    # The same rules the rewrite prompt asks for, checked locally; keywords = extract_keywords(job_desc)
+    words = bullet.split()
+    if not words or len(words) >= BULLET_MAX_WORDS:
+        return False
+    if words[0].lower().strip(",.:;") not in STRONG_VERBS or not PERCENT_RE.search(bullet):
+        return False
+    return len(extract_keywords(bullet) & keywords) >= BULLET_MIN_KEYWORDS
+
+def generate_summary(job_title, job_desc, use_cache=True, on_delta=None, n=1):
+    # Professional Summary (keyword-rich); on_delta receives streamed chunks when given (one candidate only)
+    prompt = f"""
+    Write a 3-sentence professional summary for a {job_title}.
+    Use these keywords from the job description: {', '.join(job_index(job_desc).top_terms(10))}.
+    Start with "{job_title}". Include at least one percentage (e.g., "improved efficiency by 30%").
+    Avoid pronouns. No fluff.
+    """
+    if on_delta is None:
+        return get_ai_response(prompt, use_cache=use_cache, stage="llm_summary", n=n)
+    parts = []
+    for delta in stream_ai_response(prompt, use_cache=use_cache, stage="llm_summary"):
+        parts.append(delta)
+        on_delta(delta)
+    return "".join(parts).strip()
+
+def finish_bullet(text):
+    improved = text.strip().strip('"').strip("'")
+    if "%" not in improved:
+        improved += " — improving performance by 30%."
+    return improved
+
+def job_context(job_desc, bullet):
+    # Job description text for one bullet's prompt: its most relevant excerpts, or all of it
+    if not PROMPT_COMPACTION:
+        return job_desc
+    context = job_index(job_desc).excerpt(bullet, PROMPT_EXCERPT_SENTENCES, PROMPT_EXCERPT_TOKENS * 4)
+    incr("prompt_chars_saved", len(job_desc) - len(context))
+    return context
+
+def bullet_token_estimate(bullet, job_desc):
+    # Prompt at ~4 characters per token (the excerpt budget bounds the job description part) plus each reply
+    context = min(len(job_desc), PROMPT_EXCERPT_TOKENS * 4) if PROMPT_COMPACTION else len(job_desc)
+    return (BULLET_PROMPT_CHARS + len(bullet) + context) // 4 + BULLET_REPLY_TOKENS * LLM_CANDIDATES
+
+def enhance_bullet(bullet, job_title, job_desc, use_cache=True, n=1):
+    # Enhance bullet (force %); a list of candidates when n > 1
+    raw = get_ai_response(f"""
+    Rewrite this resume bullet for a {job_title} role.
+    Original: "{bullet}"
+    Job description: {job_context(job_desc, bullet)}
+    Rules:
+    - Start with strong verb: Engineered, Led, Optimized, etc.
+    - ALWAYS include a realistic percentage improvement (e.g., "by 25%").
+    - Use 2+ keywords from job description.
+    - Keep under 25 words.
+    - Return ONLY the bullet.
+    """, use_cache=use_cache, stage="llm_bullet", n=n)
+    return [finish_bullet(text) for text in raw] if n > 1 else finish_bullet(raw)
+
+def parse_batch_response(raw, count):
+    # Returns (summary or None, {index: bullet}); anything malformed is simply left out
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`")
+        if raw.startswith("json"):
+            raw = raw[4:]
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None, {}
+    if not isinstance(data, dict):
+        return None, {}
+    summary = data.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        summary = None
+    rewritten = {}
+    items = data.get("bullets")
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        index, text = item.get("index"), item.get("text")
+        if isinstance(index, int) and 0 <= index < count and isinstance(text, str) and text.strip():
+            rewritten[index] = finish_bullet(text)
+    return (summary.strip() if summary else None), rewritten
+
+def batch_rewrite(job_title, job_desc, bullets, use_cache=True):
+    # One call for the summary and every bullet, so job_desc is sent once
+    numbered = "\n".join(f"{i}. {bullet}" for i, bullet in enumerate(bullets))
+    raw = get_ai_response(f"""
+    Rewrite resume content for a {job_title} role.
+    Job description: {job_desc}
+
+    1) Write a 3-sentence professional summary for a {job_title}.
+    Use these keywords from the job description: {', '.join(job_index(job_desc).top_terms(10))}.
+    Start with "{job_title}". Include at least one percentage (e.g., "improved efficiency by 30%").
+    Avoid pronouns. No fluff.
+
+    2) Rewrite each numbered bullet below. Rules:
+    - Start with strong verb: Engineered, Led, Optimized, etc.
+    - ALWAYS include a realistic percentage improvement (e.g., "by 25%").
+    - Use 2+ keywords from job description.
+    - Keep under 25 words.
+
+    Bullets:
+    {numbered}
+
+    Return ONLY a JSON object, no commentary:
+    {{"summary": "...", "bullets": [{{"index": 0, "text": "..."}}, ...]}}
+    with exactly one entry per bullet index from 0 to {len(bullets) - 1}.
+    """, json_mode=True, use_cache=use_cache, stage="llm_batch")
+    return parse_batch_response(raw, len(bullets))
+
+def load_last_run(token):
+    if STATE_DB:
+        row = state_db().execute("SELECT run FROM last_runs WHERE token = ?", (token,)).fetchone()
+        return json.loads(row[0]) if row else None
+    with LAST_RUNS_LOCK:
+        return LAST_RUNS.get(token)
+
+def save_last_run(token, job_title, job_desc, summary, experiences, enhanced_experiences, skip=()):
+    # skip: flat indexes of bullets that were never rewritten (over budget), so the next run still rewrites them
+    pairs = [(b, e) for exp, enhanced in zip(experiences, enhanced_experiences)
+             for b, e in zip([b for b in exp["bullets"] if b], enhanced["bullets"])]
+    bullet_map = dict(pair for i, pair in enumerate(pairs) if i not in skip)
+    run = {"job_title": job_title, "job_desc": job_desc, "summary": summary, "bullets": bullet_map}
+    if STATE_DB:
+        db = state_db()
+        db.execute("INSERT OR REPLACE INTO last_runs VALUES (?, ?, ?)", (token, json.dumps(run), time.time()))
+        db.execute("DELETE FROM last_runs WHERE token NOT IN (SELECT token FROM last_runs ORDER BY updated DESC LIMIT ?)",
+                   (LAST_RUN_LIMIT,))
+        return
+    with LAST_RUNS_LOCK:
+        LAST_RUNS[token] = run
+        LAST_RUNS.move_to_end(token)
+        while len(LAST_RUNS) > LAST_RUN_LIMIT:
+            LAST_RUNS.popitem(last=False)
+
+def iter_resume_parts(job_title, job_desc, experiences, use_cache=True, previous=None, stream_summary=False,
+                      deadline=None):
+    # Yields (kind, index, value) as each part is ready: ("summary_delta", None, chunk) while the
+    # summary streams, ("summary", None, text), ("bullet", flat_index, text), then ("done", None, recomputed).
+    # With a deadline (epoch seconds), raises TimeoutError once it passes.
+    bullets = [bullet for exp in experiences for bullet in exp["bullets"] if bullet]
+    summary, rewritten = None, {}
+
+    # Same target job as the last run: keep its summary and any bullet whose original text is unchanged
+    if previous and previous["job_title"] == job_title and previous["job_desc"] == job_desc:
+        summary = previous["summary"]
+        rewritten = {i: previous["bullets"][b] for i, b in enumerate(bullets) if b in previous["bullets"]}
+    reused_summary, reused = summary is not None, set(rewritten)
+    if summary is not None:
+        yield "summary", None, summary
+    for i in sorted(rewritten):
+        yield "bullet", i, rewritten[i]
+
+    # Bullets that already meet the rules are kept as written
+    kept = set()
+    if BULLET_PREFILTER:
+        keywords = extract_keywords(job_desc)
+        kept = {i for i, b in enumerate(bullets) if i not in rewritten and bullet_is_compliant(b, keywords)}
+        incr("bullets_prefilter_checked", len(bullets) - len(rewritten))
+        incr("bullets_prefilter_kept", len(kept))
+        for i in sorted(kept):
+            rewritten[i] = bullets[i]
+            yield "bullet", i, bullets[i]
+
+    # All roles' bullets are one workload with per-request budgets; in form order (most recent role first),
+    # bullets past either budget are kept as written
+    over_budget, rewrites = set(), 0
+    spent = SUMMARY_TOKENS * LLM_CANDIDATES if summary is None else 0
+    for i in range(len(bullets)):
+        if i in rewritten:
+            continue
+        cost = bullet_token_estimate(bullets[i], job_desc)
+        if (BULLET_BUDGET and rewrites >= BULLET_BUDGET) or (LLM_TOKEN_BUDGET and spent + cost > LLM_TOKEN_BUDGET):
+            over_budget.add(i)
+        else:
+            spent += cost
+            rewrites += 1
+    if over_budget:
+        incr("bullets_over_budget", len(over_budget))
+        for i in sorted(over_budget):
+            rewritten[i] = bullets[i]
+            yield "bullet", i, bullets[i]
+
+    todo = [i for i in range(len(bullets)) if i not in rewritten]
+    if LLM_BATCH_MODE and todo:
+        batch_summary, batch = None, {}
+        try:
+            batch_summary, batch = batch_rewrite(job_title, job_desc, [bullets[i] for i in todo], use_cache)
+        except Exception as e:
+            app.logger.warning("Batch rewrite failed, using per-bullet calls: %s", e)
+        if summary is None and batch_summary is not None:
+            summary = batch_summary
+            yield "summary", None, summary
+        for j, text in sorted(batch.items()):
+            rewritten[todo[j]] = text
+            yield "bullet", todo[j], text
+        if summary is None or len(batch) < len(todo):
+            app.logger.warning("Batch rewrite returned %d/%d bullets, summary=%s; filling in per bullet",
+                               len(batch), len(todo), summary is not None)
+
+    # Summary and every remaining bullet go out at once and are yielded as they finish.
+    # With candidates, each part first shows its individually best candidate.
+    missing = [i for i in range(len(bullets)) if i not in rewritten]
+    jobs = (summary is None) + len(missing)
+    ready = queue.Queue()
+    index = job_index(job_desc)
+    candidates, shown = {}, {}
+
+    def run(kind, index, fn, *args):
+        try:
+            ready.put((kind, index, fn(*args)))
+        except Exception as e:
+            ready.put(("error", index, e))
 
-    .output {
-      background: white;
-      padding: 24px;
-      border-radius: 14px;
-      font-family: 'SFMono-Regular', 'Consolas', monospace;
-      white-space: pre-wrap;
-      margin: 24px 0;
-      border: 1px solid #d1fae5;
-      font-size: 16px;
-      line-height: 1.7;
-      color: #065f46;
+    pool = ThreadPoolExecutor(max_workers=max(1, min(jobs, LLM_CONCURRENCY * max(1, len(experiences)),
+                                                     llm_limiter.max_limit)))
+    try:
+        # Each task runs in a copy of this context so its timings land on the current request
+        if summary is None:
+            on_delta = (lambda delta: ready.put(("summary_delta", None, delta))) if stream_summary else None
+            pool.submit(contextvars.copy_context().run, run, "summary", None, generate_summary, job_title, job_desc,
+                        use_cache, on_delta, 1 if stream_summary else LLM_CANDIDATES)
+        for i in missing:
+            pool.submit(contextvars.copy_context().run, run, "bullet", i, enhance_bullet, bullets[i], job_title,
+                        job_desc, use_cache, LLM_CANDIDATES)
+        while jobs:
+            try:
+                kind, part, value = ready.get(timeout=None if deadline is None else max(0, deadline - time.time()))
+            except queue.Empty:
+                raise TimeoutError("Resume generation timed out.")
+            if kind == "error":
+                raise value
+            if kind == "summary_delta":
+                yield kind, part, value
+                continue
+            jobs -= 1
+            if isinstance(value, list):
+                candidates[kind, part] = value
+                value = shown[kind, part] = max(value, key=index.score)
+            if kind == "summary":
+                summary = value
+            else:
+                rewritten[part] = value
+            yield kind, part, value
+    finally:
+        # On the first failure (or a client that went away), drop whatever has not started yet
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Then the combination that covers the most of the posting together replaces those picks
+    selection = None
+    if candidates:
+        fixed = ([summary] if ("summary", None) not in candidates else []) + \
+                [text for i, text in rewritten.items() if ("bullet", i) not in candidates]
+        chosen = select_candidates(index, " ".join(fixed), candidates)
+        for (kind, part), text in sorted(chosen.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+            if text != shown[kind, part]:
+                yield kind, part, text
+        first = " ".join(fixed + [options[0] for options in candidates.values()])
+        selection = {"n": LLM_CANDIDATES, "score_first": index.score(first),
+                     "score_selected": index.score(" ".join(fixed + list(chosen.values())))}
+        incr("candidate_selections")
+        # Counters only go up: a selection that scores below the first candidates adds to the loss instead
+        gain = selection["score_selected"] - selection["score_first"]
+        incr("candidate_score_gain", max(0, gain))
+        incr("candidate_score_loss", max(0, -gain))
+
+    # Which sections needed LLM work this time
+    recomputed = {"summary": not reused_summary, "experiences": [], "over_budget": sorted(over_budget)}
+    offset = 0
+    for exp in experiences:
+        count = len([b for b in exp["bullets"] if b])
+        here = range(offset, offset + count)
+        fresh = sum(1 for i in here if i not in reused and i not in kept and i not in over_budget)
+        recomputed["experiences"].append({"role": exp["role"], "company": exp["company"], "bullets": fresh,
+                                          "kept": sum(1 for i in here if i in kept),
+                                          "over_budget": sum(1 for i in here if i in over_budget), "total": count})
+        offset += count
+    if selection:
+        recomputed["candidates"] = selection
+    yield "done", None, recomputed
+
+def run_optimization(resume, token=None, use_cache=True, deadline=None, on_part=None):
+    # The whole pipeline on structured input; shared by the HTML form, /api/optimize and background jobs.
+    # token enables incremental reuse of that token's last run; on_part sees every part as it lands.
+    previous = load_last_run(token) if token and use_cache else None
+    summary, rewritten, recomputed = None, {}, None
+    parts = iter_resume_parts(resume["job_title"], resume["job_desc"], resume["experiences"], use_cache, previous,
+                              deadline=deadline)
+    for kind, index, value in parts:
+        if kind == "summary":
+            summary = value
+        elif kind == "bullet":
+            rewritten[index] = value
+        elif kind == "done":
+            recomputed = value
+        if on_part:
+            on_part(kind, index, value)
+    return finish_optimization(resume, token, summary, rewritten, recomputed)
+
+def finish_optimization(resume, token, summary, rewritten, recomputed):
+    experiences = resume["experiences"]
+    enhanced_experiences = assemble_experiences(experiences, rewritten)
+    if token:
+        save_last_run(token, resume["job_title"], resume["job_desc"], summary, experiences, enhanced_experiences,
+                      set(recomputed["over_budget"]))
+    with timed("ats_score"):
+        summary, score = boost_ats(resume["job_desc"], summary, enhanced_experiences, recomputed.get("candidates"))
+    return {
+        "summary": summary,
+        "experiences": enhanced_experiences,
+        "score": score,
+        "result_text": format_resume(resume["name"], resume["email"], resume["phone"], summary, enhanced_experiences, score),
+        "recomputed": recomputed,
+        "export_id": save_export(export_document(resume["name"], resume["email"], resume["phone"], summary,
+                                                 enhanced_experiences)),
     }
 
-    .copy-btn {
-      background: white;
-      color: var(--primary-dark);
-      border: 2px solid var(--primary);
-      padding: 14px 28px;
-      font-weight: 700;
-      border-radius: 12px;
-      cursor: pointer;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      gap: 10px;
-      transition: all 0.2s ease;
-      width: 100%;
-      font-size: 16px;
+def select_candidates(index, fixed_text, candidates):
+    # One candidate per part so that, with the fixed text, the parts cover the most job description weight.
+    # Coordinate ascent from each part's individually best candidate; stops when a pass changes nothing.
+    masks = {key: [index.mask(text) for text in options] for key, options in candidates.items()}
+    choice = {key: max(range(len(options)), key=lambda k: index.weight(options[k])) for key, options in masks.items()}
+    fixed = index.mask(fixed_text)
+    for _ in range(5):
+        changed = False
+        for key, options in masks.items():
+            others = fixed
+            for other, k in choice.items():
+                if other != key:
+                    others |= masks[other][k]
+            gains = [index.weight(mask & ~others) for mask in options]
+            best = max(range(len(options)), key=lambda k: (gains[k], k == choice[key]))
+            changed |= best != choice[key]
+            choice[key] = best
+        if not changed:
+            break
+    return {key: candidates[key][k] for key, k in choice.items()}
+
+def assemble_experiences(experiences, rewritten):
+    # rewritten maps flat bullet index -> enhanced text, in form order
+    results = iter(rewritten[i] for i in range(len(rewritten)))
+    return [
+        {**exp, "bullets": [next(results) for bullet in exp["bullets"] if bullet]}
+        for exp in experiences
+    ]
+
+def boost_ats(job_desc, summary, enhanced_experiences, selection=None):
+    # Score the result. Appends up to 5 missing keywords to a summary under ATS_TARGET, unless candidate selection
+    # ran for this result (selection) and has already picked the best-covering texts. The score is always the real one.
+    all_content = summary + " " + " ".join(b for exp in enhanced_experiences for b in exp["bullets"])
+    score = calculate_ats_score(job_desc, all_content)
+
+    if score < ATS_TARGET and not selection:
+        missing = job_index(job_desc).missing(all_content, 5)
+        if missing:
+            summary += " " + " ".join(missing)
+            all_content = summary + " " + " ".join(b for exp in enhanced_experiences for b in exp["bullets"])
+            score = calculate_ats_score(job_desc, all_content)
+    return summary, score
+
+def format_resume(name, email, phone, summary, enhanced_experiences, score):
+    lines = [name]
+    contact = [email] + ([phone] if phone else [])
+    if contact:
+        lines.append(" | ".join(contact))
+    lines += ["", "PROFESSIONAL SUMMARY", summary, "", "WORK EXPERIENCE"]
+    for exp in enhanced_experiences:
+        lines.append(f"{exp['role']} | {exp['company']}")
+        if exp['duration']:
+            lines.append(exp['duration'])
+        for b in exp['bullets']:
+            lines.append(f"• {b}")
+        lines.append("")
+    lines.append(f"[AI Resume Score: {score}/100{' — ATS Optimized' if score >= ATS_TARGET else ''}]")
+    return "\n".join(lines)
+
+SPACES_RE = re.compile(r"[^\S\n]+")  # runs of spaces, tabs and non-breaking spaces
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+# Whole heading lines only ("Benefits", "What we offer:"), never a title that merely starts with one of the words
+BOILERPLATE_HEADING_RE = re.compile(
+    r"(?:our |the |your )?(?:benefits(?: (?:and|&) perks)?|perks(?: (?:and|&) benefits)?|what we offer|"
+    r"what you(?:'ll| will) get|why (?:join us|work (?:with|for|at) us)|compensation(?: (?:and|&) benefits)?|"
+    r"total rewards|equal (?:employment )?opportunity(?: employer)?|eeo(?: statement)?|"
+    r"diversity(?:,? equity)?(?:,? (?:and|&) inclusion)?|(?:reasonable )?accommodations?)\s*:?", re.IGNORECASE)
+EEO_RE = re.compile(r"equal (?:employment )?opportunity|without regard to|reasonable accommodation|e-verify|"
+                    r"affirmative action|protected veteran", re.IGNORECASE)
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+def is_heading(line):
+    # A short line of its own that is neither a list item nor a sentence
+    return 0 < len(line) <= 60 and not line.startswith(('•', '-', '*')) and not line.endswith(('.', ',', ';'))
+
+def strip_boilerplate(text):
+    # Benefits/EEO sections run from their heading to the next heading; EEO sentences elsewhere are dropped.
+    # The first line is the job title, never a section heading. When stripping would remove most of the
+    # posting or all of its keywords, the posting is kept as it is.
+    kept, skipping = [], False
+    for i, line in enumerate(text.split("\n")):
+        if i and is_heading(line):
+            skipping = bool(BOILERPLATE_HEADING_RE.fullmatch(line))
+        if not skipping:
+            kept.append(line)
+    stripped = "\n".join(kept)
+    if EEO_RE.search(stripped):
+        lines = []
+        for line in WRAPPED_LINE_RE.sub(" ", stripped).split("\n"):
+            if EEO_RE.search(line):
+                line = " ".join(s for s in SENTENCE_END_RE.split(line) if not EEO_RE.search(s))
+                if not line:
+                    continue
+            lines.append(line)
+        stripped = "\n".join(lines)
+    if 2 * len(stripped.strip()) < len(text.strip()) or not extract_keywords(stripped):
+        return text
+    return stripped
+
+def normalize_job_desc(text):
+    # Collapses whitespace and pasted-document artifacts and drops boilerplate before the text is indexed or
+    # prompted; the bytes saved are counted and added to the request's timing log line
+    with timed("normalize"):
+        size = len(text.encode())
+        clean = text.replace("\r\n", "\n").replace("\u200b", "")
+        clean = "\n".join(SPACES_RE.sub(" ", line).strip() for line in clean.split("\n"))
+        if STRIP_BOILERPLATE:
+            clean = strip_boilerplate(clean)
+        clean = BLANK_LINES_RE.sub("\n\n", clean).strip()
+        saved = size - len(clean.encode())
+    incr("job_desc_bytes", size)
+    incr("job_desc_bytes_saved", saved)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.count(job_desc_bytes=size, job_desc_bytes_saved=saved)
+    return clean
+
+def clean_bullets(lines):
+    bullets = []
+    for line in lines:
+        clean = line.strip()
+        if clean:
+            if clean.startswith(('•', '-', '*')):
+                clean = clean[1:].strip()
+            bullets.append(clean)
+    return bullets
+
+def field_limit(key):
+    if key == "job_desc":
+        return JOB_DESC_MAX_CHARS
+    return BULLETS_MAX_CHARS if key.startswith("bullets") else FIELD_MAX_CHARS
+
+def check_field_size(key, value):
+    limit = field_limit(key)
+    if len(value) > limit:
+        incr("requests_too_large")
+        raise RequestEntityTooLarge(f"'{key}' is too long: {len(value):,} characters, the limit is {limit:,}.")
+
+def parse_resume_form(form):
+    def field(key):
+        value = form.get(key, '')
+        check_field_size(key, value)
+        return value.strip()
+
+    name = field('name')
+    email = field('email')
+    phone = field('phone')
+    job_title = field('job_title')
+    job_desc = normalize_job_desc(field('job_desc'))
+    return {"name": name, "email": email, "phone": phone, "job_title": job_title, "job_desc": job_desc,
+            "experiences": form_experiences(form)}
+
+ROLE_FIELD_RE = re.compile(r"(?:company|role|duration|bullets)_(\d+)")
+
+def form_experiences(form, strict=True):
+    # Role sections company_<i>, role_<i>, duration_<i>, bullets_<i>, for any number of i, in order.
+    # strict is the pipeline's input: size caps, a required first role, cleaned bullets. Otherwise
+    # (refilling the form after a paywall or an error) every started role is kept as typed.
+    indexes = sorted({int(m.group(1)) for m in map(ROLE_FIELD_RE.fullmatch, form.keys()) if m})
+    if len(indexes) > MAX_ROLES:
+        if strict:
+            raise ValueError(f"Please enter at most {MAX_ROLES} roles.")
+        indexes = indexes[:MAX_ROLES]
+    experiences = []
+    for n, i in enumerate(indexes):
+        fields = {}
+        for key in ("company", "role", "duration", "bullets"):
+            value = form.get(f"{key}_{i}", '')
+            if strict:
+                check_field_size(f"{key}_{i}", value)
+            fields[key] = value.strip()
+        if not fields["company"] or not fields["role"]:
+            if strict and n == 0:
+                raise ValueError("Please fill in your first work experience.")
+            if strict or not (fields["company"] or fields["role"]):
+                continue
+        lines = fields["bullets"].split('\n')
+        fields["bullets"] = clean_bullets(lines) if strict else [line.strip() for line in lines if line.strip()]
+        experiences.append(fields)
+    return experiences
+
+def parse_resume_json(data):
+    # Same shape as parse_resume_form(), from a JSON body with any number of roles
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object.")
+
+    def text(obj, key, required=False):
+        value = obj.get(key) or ""
+        if not isinstance(value, str):
+            raise ValueError(f"'{key}' must be a string.")
+        if required and not value.strip():
+            raise ValueError(f"'{key}' is required.")
+        check_field_size(key, value)
+        return value.strip()
+
+    experiences = []
+    raw_experiences = data.get("experiences")
+    if not isinstance(raw_experiences, list) or not raw_experiences:
+        raise ValueError("'experiences' must be a non-empty list.")
+    if len(raw_experiences) > MAX_ROLES:
+        raise ValueError(f"At most {MAX_ROLES} experiences are allowed.")
+    for exp in raw_experiences:
+        if not isinstance(exp, dict):
+            raise ValueError("Each experience must be an object.")
+        bullets = exp.get("bullets") or []
+        if isinstance(bullets, str):
+            bullets = bullets.split("\n")
+        if not isinstance(bullets, list) or not all(isinstance(b, str) for b in bullets):
+            raise ValueError("'bullets' must be a list of strings.")
+        check_field_size("bullets", "\n".join(bullets))
+        experiences.append({
+            "company": text(exp, "company", required=True),
+            "role": text(exp, "role", required=True),
+            "duration": text(exp, "duration"),
+            "bullets": clean_bullets(bullets),
+        })
+    return {
+        "name": text(data, "name"),
+        "email": text(data, "email"),
+        "phone": text(data, "phone"),
+        "job_title": text(data, "job_title", required=True),
+        "job_desc": normalize_job_desc(text(data, "job_desc", required=True)),
+        "experiences": experiences,
     }
 
-    .copy-btn:hover {
-      background: #f0f9ff;
-      transform: scale(1.02);
+def describe_recomputed(recomputed):
+    parts = ["summary"] if recomputed["summary"] else []
+    for exp in recomputed["experiences"]:
+        if exp["bullets"]:
+            parts.append(f"{exp['role']} | {exp['company']} ({exp['bullets']}/{exp['total']} bullets)")
+    kept = sum(exp.get("kept", 0) for exp in recomputed["experiences"])
+    over = len(recomputed.get("over_budget", ()))
+    text = ", ".join(parts) if parts else "nothing (reused your last run)"
+    if kept:
+        text += f"; kept {kept} bullet{'s' if kept != 1 else ''} that already met the rules"
+    if over:
+        text += f"; {over} bullet{'s' if over != 1 else ''} over this request's budget left as written"
+    return text
+
+@lru_cache(maxsize=16)
+def upi_qr_png(upi_id, amount, note):
+    # Rendered once per payment target; returns (PNG bytes, ETag)
+    upi_url = f"upi://pay?pa={upi_id}&pn=ResumeTailor&am={amount}&tn={note}&cu=INR"
+
+    qr = qrcode.QRCode(version=1, box_size=8, border=2)
+    qr.add_data(upi_url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    png = buffer.getvalue()
+    return png, hashlib.sha256(png).hexdigest()
+
+# ===== BULK SCORING =====
+def parse_resume_record(line, seq):
+    # A JSONL line is either {"id": ..., "text": ...} or a bare JSON string; returns (id, text)
+    record = json.loads(line)
+    if isinstance(record, str):
+        return seq, record
+    if isinstance(record, dict) and isinstance(record.get("text"), str):
+        return record.get("id", seq), record["text"]
+    raise ValueError('expected {"id": ..., "text": ...} or a JSON string')
+
+def iter_resume_records(lines):
+    # Yields (id, text, error) per non-blank line so one bad line doesn't stop the batch
+    seq = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode("utf-8")
+                except UnicodeDecodeError as e:
+                    raise ValueError(f"line is not valid UTF-8 (byte {e.start})")
+            rid, text = parse_resume_record(line, seq)
+            yield rid, text, None
+        except ValueError as e:
+            yield seq, None, str(e)
+        seq += 1
+
+def score_records(index, records):
+    results = []
+    for rid, text, error in records:
+        if error:
+            results.append({"id": rid, "error": error})
+        else:
+            score, matched, missing = index.report(text)
+            results.append({"id": rid, "score": score, "matched": matched, "missing": missing})
+    return results
+
+def _score_chunk(job_desc, records):
+    # job_index is memoized, so each pool process indexes a job description once, not once per chunk
+    return score_records(job_index(job_desc), records)
+
+def get_bulk_pool(processes):
+    global _bulk_pool
+    with _bulk_lock:
+        if _bulk_pool is None:
+            _bulk_pool = ProcessPoolExecutor(max_workers=processes)
+        return _bulk_pool
+
+def iter_bulk_scores(job_desc, records, processes=None, chunk_size=None):
+    # Scores stream out in input order; at most a few chunks per request are held in memory at once
+    global _bulk_pool
+    processes = processes or max(1, BULK_PROCESSES // SERVER_WORKERS)
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    records = iter(records)
+    chunks = iter(lambda: list(islice(records, chunk_size)), [])
+    first = next(chunks, [])
+    if processes <= 1 or len(first) < chunk_size:
+        index = job_index(job_desc)
+        for chunk in chain([first], chunks):
+            yield from score_records(index, chunk)
+        return
+    pool = get_bulk_pool(processes)
+    in_flight = deque()
+    try:
+        for chunk in chain([first], chunks):
+            in_flight.append(pool.submit(_score_chunk, job_desc, chunk))
+            if len(in_flight) >= processes * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+    except BrokenProcessPool:
+        # A pool process died (e.g. OOM-killed): the next request gets a new pool
+        with _bulk_lock:
+            if _bulk_pool is pool:
+                _bulk_pool = None
+        raise
+    finally:
+        # A client that went away leaves nothing queued for the other requests to wait behind
+        for future in in_flight:
+            future.cancel()
+
+def iter_ranked_lines(job_desc, records, processes=None):
+    # One JSON line per resume, then a final {"ranking": [...]} line ordered by score
+    ranking = []
+    for seq, result in enumerate(iter_bulk_scores(normalize_job_desc(job_desc), records, processes)):
+        if "score" in result:
+            ranking.append((-result["score"], seq, result["id"]))
+        yield json.dumps(result) + "\n"
+    ranking.sort()
+    yield json.dumps({"ranking": [rid for _, _, rid in ranking], "count": len(ranking)}) + "\n"
+
+# ===== EXPORT =====
+def export_document(name, email, phone, summary, experiences):
+    # What a download is rendered from; its hash is the export id
+    return {
+        "name": name, "email": email, "phone": phone, "summary": summary,
+        "experiences": [{"role": exp["role"], "company": exp["company"], "duration": exp["duration"],
+                         "bullets": exp["bullets"]} for exp in experiences],
     }
 
-    .exp-section {
-      background: #f8fafc;
-      padding: 20px;
-      border-radius: 12px;
-      margin-bottom: 20px;
-      border: 1px dashed #cbd5e1;
+def resume_blocks(doc):
+    # The layout every format shares: (kind, text) in reading order, as in format_resume()
+    if doc["name"]:
+        yield "name", doc["name"]
+    contact = " | ".join(value for value in (doc["email"], doc["phone"]) if value)
+    if contact:
+        yield "contact", contact
+    yield "heading", "PROFESSIONAL SUMMARY"
+    yield "body", doc["summary"]
+    yield "heading", "WORK EXPERIENCE"
+    for exp in doc["experiences"]:
+        yield "role", f"{exp['role']} | {exp['company']}"
+        if exp["duration"]:
+            yield "duration", exp["duration"]
+        for bullet in exp["bullets"]:
+            yield "bullet", bullet
+
+MD_ESCAPE_RE = re.compile(r"([\\`*_\[\]<>])")
+MD_PREFIX = {"name": "# ", "heading": "## ", "role": "### ", "bullet": "- "}
+
+def render_markdown(doc):
+    lines, previous = [], None
+    for kind, text in resume_blocks(doc):
+        if lines and not (kind == "bullet" and previous == "bullet"):
+            lines.append("")
+        text = MD_ESCAPE_RE.sub(r"\\\1", text)
+        lines.append(f"*{text}*" if kind == "duration" else MD_PREFIX.get(kind, "") + text)
+        previous = kind
+    return ("\n".join(lines) + "\n").encode()
+
+# PDF: the standard Helvetica fonts (no embedding) in WinAnsiEncoding. Glyph widths in 1/1000 em for
+# characters 32-126 and for the cp1252 quotes, bullet and dashes (0x91-0x97), from the Adobe font metrics.
+PDF_FONTS = {
+    "F1": ("Helvetica",
+           "278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+           "278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778 667 778 722 667 "
+           "611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556 556 222 222 500 222 833 "
+           "556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584",
+           "222 222 333 333 350 556 1000"),
+    "F2": ("Helvetica-Bold",
+           "278 333 474 556 556 889 722 238 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+           "333 333 584 584 584 611 975 722 722 722 722 667 611 778 722 278 556 722 611 833 722 778 667 778 722 667 "
+           "611 722 667 944 667 667 611 333 278 333 584 556 333 556 611 556 611 556 333 611 611 278 278 556 278 889 "
+           "611 611 611 611 389 556 333 611 556 778 556 556 500 389 280 389 584",
+           "278 278 500 500 350 556 1000"),
+}
+PDF_PAGE = (612, 792)  # US Letter, points
+PDF_MARGIN = 54
+# Per block kind: font, size, leading, indent, space before (points)
+PDF_STYLES = {
+    "name": ("F2", 18, 22, 0, 0),
+    "contact": ("F1", 10, 14, 0, 2),
+    "heading": ("F2", 11.5, 16, 0, 14),
+    "body": ("F1", 10.5, 14, 0, 4),
+    "role": ("F2", 11, 15, 0, 8),
+    "duration": ("F1", 9.5, 13, 0, 0),
+    "bullet": ("F1", 10.5, 14, 14, 2),
+}
+
+@lru_cache(maxsize=None)
+def pdf_font_widths(font):
+    # Parsed once per process; characters without metrics (accented letters, ...) are assumed wide
+    _, ascii_widths, extra_widths = PDF_FONTS[font]
+    widths = [667] * 256
+    widths[32:127] = [int(w) for w in ascii_widths.split()]
+    widths[0x91:0x98] = [int(w) for w in extra_widths.split()]
+    return widths
+
+def pdf_wrap(text, widths, size, max_width):
+    # Greedy word wrap of cp1252 bytes; a word longer than a line is split wherever it overflows
+    scale = size / 1000
+    lines, line, used = [], b"", 0.0
+    for word in text.split():
+        width = sum(widths[c] for c in word) * scale
+        if line and used + widths[32] * scale + width > max_width:
+            lines.append(line)
+            line, used = b"", 0.0
+        while width > max_width:
+            cut, taken = 0, 0.0
+            while cut < len(word) - 1 and taken + widths[word[cut]] * scale <= max_width:
+                taken += widths[word[cut]] * scale
+                cut += 1
+            lines.append(word[:max(cut, 1)])
+            word = word[max(cut, 1):]
+            width = sum(widths[c] for c in word) * scale
+        line, used = (line + b" " + word, used + widths[32] * scale + width) if line else (word, width)
+    return lines + [line] if line else lines
+
+def pdf_string(data):
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def pdf_text(font, size, x, y, data):
+    return b"BT /%s %.1f Tf %.2f %.2f Td %s Tj ET" % (font.encode(), size, x, y, pdf_string(data))
+
+def render_pdf(doc):
+    width, height = PDF_PAGE
+    pages, ops, y = [], [], height - PDF_MARGIN
+    for kind, text in resume_blocks(doc):
+        font, size, leading, indent, before = PDF_STYLES[kind]
+        lines = pdf_wrap(text.encode("cp1252", "replace"), pdf_font_widths(font), size, width - 2 * PDF_MARGIN - indent)
+        y -= before
+        for i, line in enumerate(lines):
+            if y - leading < PDF_MARGIN:
+                pages.append(ops)
+                ops, y = [], height - PDF_MARGIN
+            y -= leading
+            if kind == "bullet" and i == 0:
+                ops.append(pdf_text("F1", size, PDF_MARGIN + indent - 10, y, b"\x95"))
+            ops.append(pdf_text(font, size, PDF_MARGIN + indent, y, line))
+        if kind == "heading":
+            ops.append(b"0.6 G 0.5 w %d %.2f m %d %.2f l S" % (PDF_MARGIN, y - 4, width - PDF_MARGIN, y - 4))
+            y -= 4
+    pages.append(ops)
+
+    # Objects: 1 catalog, 2 page tree, 3 info, then one font per PDF_FONTS entry and a page + content pair per page
+    fonts = {name: 4 + i for i, name in enumerate(PDF_FONTS)}
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Title %s /Producer (ResumeTailor) >>" % pdf_string(doc["name"].encode("cp1252", "replace"))]
+    objects += [b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % base.encode()
+                for base, _, _ in PDF_FONTS.values()]
+    resources = b"<< /Font << %s >> >>" % b" ".join(b"/%s %d 0 R" % (name.encode(), num) for name, num in fonts.items())
+    kids = []
+    for ops in pages:
+        stream = zlib.compress(b"\n".join(ops))
+        kids.append(len(objects) + 1)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+                       % (width, height, resources, len(objects) + 2))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out, offsets = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"), []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+# DOCX: one paragraph style per block kind (sizes in half-points, spacing in twentieths of a point)
+DOCX_STYLES = {
+    "name": ('<w:spacing w:after="40"/>', '<w:b/><w:sz w:val="36"/>'),
+    "contact": ('<w:spacing w:after="120"/>', '<w:sz w:val="20"/>'),
+    "heading": ('<w:pBdr><w:bottom w:val="single" w:sz="4" w:space="1" w:color="999999"/></w:pBdr>'
+                '<w:spacing w:before="280" w:after="80"/>', '<w:b/><w:sz w:val="23"/>'),
+    "body": ('<w:spacing w:after="80"/>', ''),
+    "role": ('<w:keepNext/><w:spacing w:before="160" w:after="0"/>', '<w:b/><w:sz w:val="22"/>'),
+    "duration": ('<w:keepNext/><w:spacing w:after="40"/>', '<w:i/><w:sz w:val="19"/>'),
+    "bullet": ('<w:ind w:left="360" w:hanging="220"/><w:spacing w:after="40"/>', ''),
+}
+XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+@lru_cache(maxsize=None)
+def docx_parts():
+    # The package parts that are the same for every resume, built once per process
+    styles = "".join(
+        f'<w:style w:type="paragraph" w:styleId="{kind.title()}"><w:name w:val="{kind.title()}"/>'
+        f'<w:pPr>{paragraph}</w:pPr><w:rPr>{run}</w:rPr></w:style>'
+        for kind, (paragraph, run) in DOCX_STYLES.items())
+    return {
+        "[Content_Types].xml":
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '<Override PartName="/word/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+            '</Types>',
+        "_rels/.rels":
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>',
+        "word/_rels/document.xml.rels":
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/></Relationships>',
+        "word/styles.xml":
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:styles {W_NS}>'
+            '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>'
+            '<w:sz w:val="21"/></w:rPr></w:rPrDefault></w:docDefaults>'
+            f'{styles}</w:styles>',
     }
 
-    footer {
-      text-align: center;
-      padding: 20px;
-      color: var(--gray);
-      font-size: 0.9rem;
-    }
+def render_docx(doc):
+    paragraphs = []
+    for kind, text in resume_blocks(doc):
+        text = xml_escape(XML_INVALID_RE.sub("", text))
+        runs = f'<w:r><w:t>•</w:t></w:r><w:r><w:tab/><w:t xml:space="preserve">{text}</w:t></w:r>' if kind == "bullet" \
+            else f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>'
+        paragraphs.append(f'<w:p><w:pPr><w:pStyle w:val="{kind.title()}"/></w:pPr>{runs}</w:p>')
+    document = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {W_NS}><w:body>'
+                f'{"".join(paragraphs)}<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+                '<w:pgMar w:top="1080" w:right="1080" w:bottom="1080" w:left="1080" w:header="720" w:footer="720" w:gutter="0"/>'
+                '</w:sectPr></w:body></w:document>')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+        # Fixed timestamps: the same resume gives the same bytes
+        for name, data in {**docx_parts(), "word/document.xml": document}.items():
+            package.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data, zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+EXPORT_RENDERERS = {"pdf": render_pdf, "docx": render_docx, "md": render_markdown}
+
+def export_path(export_id, fmt):
+    return os.path.join(EXPORT_DIR, f"{export_id}.{fmt}")
+
+def write_atomic(path, data):
+    # Readers in other threads or processes see the old file or the new one, never half of one
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def sweep_exports():
+    # At most every EXPORT_TTL / 24 seconds per process
+    global _export_swept
+    now = time.time()
+    if now - _export_swept < EXPORT_TTL / 24:
+        return
+    _export_swept = now
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < now - EXPORT_TTL:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def save_export(doc):
+    # Returns the export id, or None when exports are off or the directory is not writable
+    if not EXPORT_DIR:
+        return None
+    data = json.dumps(doc, sort_keys=True, separators=(",", ":")).encode()
+    export_id = hashlib.sha256(data).hexdigest()[:32]
+    try:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = export_path(export_id, "json")
+        if os.path.exists(path):
+            os.utime(path)  # same resume again: keep it for another EXPORT_TTL
+        else:
+            write_atomic(path, data)
+        sweep_exports()
+    except OSError as e:
+        app.logger.warning("Cannot store export %s: %s", export_id, e)
+        return None
+    if EXPORT_PREFETCH:
+        for fmt in EXPORT_FORMATS:
+            render_export_async(export_id, fmt, doc)
+    return export_id
+
+def render_export_file(export_id, fmt, doc):
+    try:
+        path = export_path(export_id, fmt)
+        if os.path.exists(path):
+            return path
+        if doc is None:
+            with open(export_path(export_id, "json"), "rb") as f:
+                doc = json.load(f)
+        with timed("export_render"):
+            data = EXPORT_RENDERERS[fmt](doc)
+        write_atomic(path, data)
+        incr("exports_rendered")
+        return path
+    finally:
+        with _export_lock:
+            _export_futures.pop((export_id, fmt), None)
+
+def render_export_async(export_id, fmt, doc=None):
+    # One render per file at a time: a download waits on the prefetch already running for it.
+    # The pool is created on first use, so with gunicorn each worker process gets its own after fork.
+    global _export_pool
+    with _export_lock:
+        future = _export_futures.get((export_id, fmt))
+        if future is None:
+            if _export_pool is None:
+                _export_pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+            future = _export_futures[(export_id, fmt)] = _export_pool.submit(render_export_file, export_id, fmt, doc)
+    return future
+
+def export_links(export_id, **params):
+    if not export_id:
+        return {}
+    return {fmt: url_for('download_export', export_id=export_id, fmt=fmt, **params) for fmt in EXPORT_FORMATS}
+
+# ===== BACKGROUND JOBS =====
+class MemoryJobStore:
+    # In-process queue; jobs are only visible to the worker process that accepted them
+    def __init__(self, max_depth):
+        self.pending = queue.Queue(maxsize=max_depth)
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, job_id, payload):
+        with self.lock:
+            now = time.time()
+            for old_id in [j for j, job in self.jobs.items() if job["finished"] and job["finished"] < now - JOB_RESULT_TTL]:
+                del self.jobs[old_id]
+            self.jobs[job_id] = {"status": "queued", "progress": 0, "total": 0, "result": None, "error": None,
+                                 "created": now, "finished": None}
+        try:
+            self.pending.put_nowait((job_id, payload))
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job_id]
+            return False
+        return True
+
+    def claim(self, timeout):
+        try:
+            job_id, payload = self.pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.update(job_id, status="running")
+        return job_id, payload
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            if fields.get("status") in ("done", "failed"):
+                fields["finished"] = time.time()
+            self.jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def depth(self):
+        return self.pending.qsize()
+
+class SqliteJobStore:
+    # Queue table in a local SQLite file, shared by every worker process on the box
+    def __init__(self, path, max_depth):
+        self.path = path
+        self.max_depth = max_depth
+        self.local = threading.local()
+        self.db().execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, status TEXT, payload TEXT, progress INTEGER, total INTEGER,
+            result TEXT, error TEXT, created REAL, finished REAL, started REAL)""")
+        self.db().execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        try:
+            self.db().execute("ALTER TABLE jobs ADD COLUMN started REAL")  # files from before the column existed
+        except sqlite3.OperationalError:
+            pass
+        self.fail_stale()
+
+    def db(self):
+        if not hasattr(self.local, "conn"):
+            self.local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self.local.conn.execute("PRAGMA journal_mode=WAL")
+        return self.local.conn
+
+    def submit(self, job_id, payload):
+        db = self.db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM jobs WHERE finished < ?", (time.time() - JOB_RESULT_TTL,))
+            self.fail_stale()
+            if db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0] >= self.max_depth:
+                return False
+            db.execute("INSERT INTO jobs (id, status, payload, progress, total, created) VALUES (?, 'queued', ?, 0, 0, ?)",
+                       (job_id, json.dumps(payload), time.time()))
+            return True
+        finally:
+            db.execute("COMMIT")
+
+    def claim(self, timeout):
+        db = self.db()
+        deadline = time.time() + timeout
+        while True:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT id, payload FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row:
+                    db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row[0]))
+            finally:
+                db.execute("COMMIT")
+            if row:
+                return row[0], json.loads(row[1])
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.2)
+
+    def fail_stale(self):
+        # A job still "running" well past its deadline belonged to a worker process that died or was restarted
+        # (a live job fails itself at JOB_TIMEOUT, give or take one LLM call)
+        now = time.time()
+        self.db().execute("UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE status = 'running' "
+                          "AND COALESCE(started, created) < ?",
+                          ("The job was interrupted, please try again.", now, now - JOB_TIMEOUT - LLM_TIMEOUT))
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        if fields.get("status") in ("done", "failed"):
+            fields["finished"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self.db().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        row = self.db().execute(
+            "SELECT status, progress, total, result, error, created, finished FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        status, progress, total, result, error, created, finished = row
+        return {"status": status, "progress": progress, "total": total, "result": json.loads(result) if result else None,
+                "error": error, "created": created, "finished": finished}
+
+    def depth(self):
+        return self.db().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+def get_job_store():
+    global _job_store
+    if _job_store is None:
+        with _job_lock:
+            if _job_store is None:
+                if JOB_BACKEND == "sqlite":
+                    _job_store = SqliteJobStore(JOB_DB, JOB_QUEUE_DEPTH)
+                else:
+                    _job_store = MemoryJobStore(JOB_QUEUE_DEPTH)
+    return _job_store
+
+def ensure_job_workers():
+    # Workers start on first use rather than at import, so forking servers don't inherit threads
+    global _job_workers_started
+    if not _job_workers_started:
+        with _job_lock:
+            if not _job_workers_started:
+                for n in range(JOB_WORKERS):
+                    threading.Thread(target=job_worker, name=f"resume-job-{n}", daemon=True).start()
+                _job_workers_started = True
+
+def job_worker():
+    while True:
+        # A store error (e.g. "database is locked") must not end the thread: nothing would start it again
+        try:
+            store = get_job_store()
+            claimed = store.claim(timeout=5)
+            if claimed:
+                run_job(store, *claimed)
+        except Exception:
+            app.logger.exception("Job worker error")
+            time.sleep(1)
+
+def run_job(store, job_id, payload):
+    try:
+        resume = payload["resume"]
+        total = 1 + sum(len([b for b in exp["bullets"] if b]) for exp in resume["experiences"])
+        store.update(job_id, total=total)
+        done = set()
+
+        def on_part(kind, index, value):
+            # A part can arrive twice (candidate selection revises it), so count distinct parts
+            if kind in ("summary", "bullet") and (kind, index) not in done:
+                done.add((kind, index))
+                store.update(job_id, progress=len(done))
+
+        result = run_optimization(resume, payload["token"], payload["use_cache"],
+                                  deadline=time.time() + JOB_TIMEOUT, on_part=on_part)
+        store.update(job_id, status="done", result={
+            "result_text": result["result_text"], "score": result["score"],
+            "recomputed": describe_recomputed(result["recomputed"]), "export_id": result["export_id"],
+        })
+    except Exception as e:
+        app.logger.warning("Job %s failed: %s", job_id, e)
+        store.update(job_id, status="failed", error=str(e))
+
+# ===== STATIC ASSETS =====
+def build_assets(folder):
+    # Read, fingerprint and pre-compress every asset once at startup
+    assets = {}
+    for filename in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, filename), "rb") as f:
+            data = f.read()
+        stem, ext = os.path.splitext(filename)
+        digest = hashlib.sha256(data).hexdigest()
+        assets[f"{stem}.{digest[:10]}{ext}"] = {
+            "source": filename,
+            "mimetype": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            "etag": digest,
+            "identity": data,
+            "gzip": gzip.compress(data, 9),
+            "br": brotli.compress(data) if brotli else None,
+        }
+    return assets
+
+ASSETS = build_assets(ASSET_DIR)
+ASSET_URLS = {asset["source"]: f"/assets/{name}" for name, asset in ASSETS.items()}
+
+def asset_url(filename):
+    return ASSET_URLS[filename]
+
+def pick_encoding(available=("br", "gzip")):
+    # Best encoding the client accepts among the ones we can produce, or None
+    for encoding in available:
+        if (encoding != "br" or brotli) and request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
 
-    @media (max-width: 600px) {
-      h1 { font-size: 2rem; }
-      .card-body { padding: 24px 20px; }
-      .btn { padding: 14px; font-size: 16px; }
-      .score-badge { font-size: 1.5rem; padding: 10px 16px; }
-    }
-  </style>
+# ===== HTML TEMPLATE =====
+HTML = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+  <title>ResumeTailor · AI-Powered ATS Optimizer</title>
+  <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
+  <link rel="stylesheet" href="{{ asset_url('style.css') }}">
 </head>
 <body>
   <div class="container">
@@ -358,7 +2264,7 @@ HTML = '''
         <h2 class="card-title"><i class="fas fa-edit"></i> Build Your AI-Optimized Resume</h2>
       </div>
       <div class="card-body">
-        <form method="POST">
+        <form method="POST" id="resume-form">
           <div class="form-group">
             <label><i class="fas fa-user"></i> Full Name</label>
             <input type="text" name="name" value="{{ name or '' }}" required>
@@ -386,43 +2292,28 @@ HTML = '''
 
           <div class="form-group">
             <label><i class="fas fa-building"></i> Work Experience</label>
-            <p style="margin-bottom: 12px; color: var(--gray);">Add your current/most recent role. Optionally add a second.</p>
-
-            <!-- Role 1 (Required) -->
-            <div class="exp-section">
-              <div style="display: flex; gap: 12px; flex-wrap: wrap;">
-                <div style="flex: 1; min-width: 200px;">
-                  <input type="text" name="company_0" placeholder="Company *" value="{{ experiences[0].company if experiences and experiences|length > 0 else '' }}" required>
-                </div>
-                <div style="flex: 1; min-width: 200px;">
-                  <input type="text" name="role_0" placeholder="Your Title *" value="{{ experiences[0].role if experiences and experiences|length > 0 else '' }}" required>
-                </div>
-                <div style="flex: 1; min-width: 200px;">
-                  <input type="text" name="duration_0" placeholder="Duration" value="{{ experiences[0].duration if experiences and experiences|length > 0 else '' }}">
+            <p style="margin-bottom: 12px; color: var(--gray);">Add your current/most recent role first, then any earlier ones.</p>
+
+            <div id="roles" data-max="{{ max_roles }}">
+              {% for i in range([experiences|length if experiences else 0, 2]|max) %}
+              {% set exp = experiences[i] if experiences and i < experiences|length else none %}
+              <div class="exp-section">
+                <div style="display: flex; gap: 12px; flex-wrap: wrap;">
+                  <div style="flex: 1; min-width: 200px;">
+                    <input type="text" name="company_{{ i }}" placeholder="{% if i == 0 %}Company *{% else %}Company (optional){% endif %}" value="{{ exp.company if exp else '' }}"{% if i == 0 %} required{% endif %}>
+                  </div>
+                  <div style="flex: 1; min-width: 200px;">
+                    <input type="text" name="role_{{ i }}" placeholder="{% if i == 0 %}Your Title *{% else %}Your Title (optional){% endif %}" value="{{ exp.role if exp else '' }}"{% if i == 0 %} required{% endif %}>
+                  </div>
+                  <div style="flex: 1; min-width: 200px;">
+                    <input type="text" name="duration_{{ i }}" placeholder="Duration" value="{{ exp.duration if exp else '' }}">
+                  </div>
                 </div>
+                <textarea name="bullets_{{ i }}" placeholder="{% if i == 0 %}• Led a team of 5...&#10;• Increased revenue by 30...{% else %}• Managed cross-functional projects...{% endif %}">{{ exp.bullets|join('\n') if exp else '' }}</textarea>
               </div>
-              <textarea name="bullets_0" placeholder="• Led a team of 5...&#10;• Increased revenue by 30...">{{ 
-                (experiences[0].bullets|join('\n') if experiences and experiences|length > 0 else '') 
-              }}</textarea>
-            </div>
-
-            <!-- Role 2 (Optional) -->
-            <div class="exp-section">
-              <div style="display: flex; gap: 12px; flex-wrap: wrap;">
-                <div style="flex: 1; min-width: 200px;">
-                  <input type="text" name="company_1" placeholder="Company (optional)" value="{{ experiences[1].company if experiences and experiences|length > 1 else '' }}">
-                </div>
-                <div style="flex: 1; min-width: 200px;">
-                  <input type="text" name="role_1" placeholder="Your Title (optional)" value="{{ experiences[1].role if experiences and experiences|length > 1 else '' }}">
-                </div>
-                <div style="flex: 1; min-width: 200px;">
-                  <input type="text" name="duration_1" placeholder="Duration" value="{{ experiences[1].duration if experiences and experiences|length > 1 else '' }}">
-                </div>
-              </div>
-              <textarea name="bullets_1" placeholder="• Managed cross-functional projects...">{{ 
-                (experiences[1].bullets|join('\n') if experiences and experiences|length > 1 else '') 
-              }}</textarea>
+              {% endfor %}
             </div>
+            <button type="button" class="add-role-btn" id="add-role"><i class="fas fa-plus"></i> Add another role</button>
           </div>
 
           <button class="btn" type="submit">
@@ -430,29 +2321,31 @@ HTML = '''
           </button>
         </form>
 
-        {% if error %}
-        <div class="error">
+        <div class="error" id="error"{% if not error %} style="display: none;"{% endif %}>
           {{ error }}
         </div>
-        {% endif %}
 
-        {% if result_text %}
-        <div class="result-card">
+        <div class="result-card" id="result-card"{% if not result_text %} style="display: none;"{% endif %}>
           <div class="ats-meter">
-            <div class="score-badge">{{ score }}%</div>
+            <div class="score-badge" id="score">{% if result_text %}{{ score }}%{% else %}…{% endif %}</div>
             <div>
               <div class="score-label">ATS Optimization Score</div>
-              <div class="keywords">Optimized for "{{ job_title }}"</div>
+              <div class="keywords" id="job-title-label">Optimized for "{{ job_title }}"</div>
             </div>
           </div>
+          <p id="recomputed" style="font-size: 14px; color: var(--gray); margin-bottom: 12px;{% if not recomputed %} display: none;{% endif %}"><i class="fas fa-sync-alt"></i> Regenerated: <span>{{ recomputed }}</span></p>
 
           <div class="output" id="output">{{ result_text }}</div>
 
           <button class="copy-btn" onclick="navigator.clipboard.writeText(document.getElementById('output').innerText).then(() => {this.innerHTML='<i class=\'fas fa-check\'></i> Copied!'; setTimeout(() => this.innerHTML='<i class=\'fas fa-copy\'></i> Copy Full Resume', 2000);})">
             <i class="fas fa-copy"></i> Copy Full Resume
           </button>
+          <div class="downloads" id="downloads"{% if not downloads %} style="display: none;"{% endif %}>
+            <a class="copy-btn" data-format="pdf" href="{{ downloads.pdf if downloads else '#' }}"><i class="fas fa-file-pdf"></i> PDF</a>
+            <a class="copy-btn" data-format="docx" href="{{ downloads.docx if downloads else '#' }}"><i class="fas fa-file-word"></i> Word</a>
+            <a class="copy-btn" data-format="md" href="{{ downloads.md if downloads else '#' }}"><i class="fab fa-markdown"></i> Markdown</a>
+          </div>
         </div>
-        {% endif %}
       </div>
     </div>
 
@@ -460,13 +2353,100 @@ HTML = '''
       <p>© 2025 ResumeTailor · AI that gets you interviews</p>
     </footer>
   </div>
+  <script src="{{ asset_url('app.js') }}" defer></script>
 </body>
 </html>
 '''
 
+# Compiled once; render_template() accepts the Template object directly
+app.jinja_env.globals["asset_url"] = asset_url
+app.jinja_env.globals["max_roles"] = MAX_ROLES
+PAGE = app.jinja_env.from_string(HTML)
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    # Fingerprinted names change with content, so they can be cached forever
+    asset = ASSETS.get(name)
+    if not asset:
+        return "Not found", 404
+    encoding = pick_encoding()
+    response = Response(asset[encoding or "identity"], mimetype=asset["mimetype"])
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(asset["etag"] + (f"-{encoding}" if encoding else ""))
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response.make_conditional(request)
+
+@app.after_request
+def compress_response(response):
+    # Compress HTML/JSON bodies; streamed (SSE) and pre-encoded responses are left alone
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    data = response.get_data()
+    encoding = pick_encoding() if len(data) >= COMPRESS_MIN_SIZE else None
+    if encoding:
+        response.set_data(brotli.compress(data, quality=5) if encoding == "br" else gzip.compress(data, 6))
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.before_request
+def start_request_timings():
+    _request_timings.set(RequestTimings())
+
+@app.before_request
+def reject_large_requests():
+    # Declared sizes are rejected before Werkzeug reads anything; chunked bodies are cut off at the same limit
+    if request.endpoint == "bulk_score":
+        request.max_content_length = BULK_MAX_CONTENT_LENGTH
+    limit = request.max_content_length
+    if limit is not None and request.content_length is not None and request.content_length > limit:
+        incr("requests_too_large")
+        raise RequestEntityTooLarge(f"Request is too large: {request.content_length:,} bytes, the limit is {limit:,}.")
+
+@app.after_request
+def note_request_status(response):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.status = response.status_code
+    return response
+
+@app.teardown_request
+def log_request_timings(exc):
+    # Runs after a streamed response has finished, so /stream is timed end to end
+    timings = _request_timings.get()
+    if timings is None or not timings.stages:
+        return
+    total = time.perf_counter() - timings.start
+    observe("request", total)
+    if TIMING_LOG:
+        timing_logger.info(json.dumps({
+            "time": datetime.utcnow().isoformat(timespec="milliseconds"),
+            "method": request.method,
+            "path": request.path,
+            "status": timings.status,
+            "total_ms": round(total * 1000, 1),
+            "stages_ms": timings.stages,
+            **{k: round(v, 6) for k, v in timings.usage.items()},
+        }))
+
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    return {"error": str(e), "retry_after": math.ceil(e.retry_after)}, 429, {"Retry-After": str(math.ceil(e.retry_after))}
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    if request.endpoint != "optimize":
+        return {"error": e.description}, 413
+    # The form page, without echoing back a body that was never read
+    error = Markup(f'<div style="color:#ef4444;padding:15px;background:#fef2f2;border-radius:8px;">⚠️ {escape(e.description)}</div>')
+    return render_template(PAGE, experiences=[], error=error), 413
+
 @app.route('/')
 def home():
-    return render_template_string(HTML)
+    return render_template(PAGE)
 
 @app.route('/admin/token')
 def admin_token():
@@ -477,9 +2457,7 @@ def admin_token():
         return "Access denied", 403
     token = secrets.token_urlsafe(16)
     expiry = (datetime.utcnow() + timedelta(hours=24)).isoformat()
-    tokens = load_tokens()
-    tokens[token] = expiry
-    save_tokens(tokens)
+    get_token_store().add(token, expiry)
     link = f"https://resume-optimizer-briq.onrender.com/?token={token}"
     return f'''
     <div style="font-family: sans-serif; padding: 30px; max-width: 600px; margin: 0 auto;">
@@ -491,26 +2469,70 @@ def admin_token():
     </div>
     '''
 
+@app.route('/admin/stats')
+def admin_stats():
+    admin_key = os.getenv("ADMIN_KEY")
+    if not admin_key:
+        return "ADMIN_KEY not set in environment", 500
+    if request.args.get('key') != admin_key:
+        return "Access denied", 403
+    return server_metrics()[0]
+
+PROMETHEUS_COUNTERS = ("llm_calls", "llm_errors", "llm_retries", "llm_prompt_tokens", "llm_completion_tokens",
+                       "llm_cost_usd", "llm_rate_limit_retries", "llm_limiter_backoffs", "rate_limit_rejections",
+                       "bullets_prefilter_checked", "bullets_prefilter_kept", "prompt_chars_saved",
+                       "candidate_selections", "candidate_score_gain", "candidate_score_loss", "job_desc_bytes",
+                       "job_desc_bytes_saved", "requests_too_large", "exports_rendered", "bullets_over_budget")
+
+def prometheus_metrics():
+    # Core counters are reported from zero so rate() and alerts work before the first event
+    counters, stages, gauges = server_metrics()
+    stats = {**dict.fromkeys(PROMETHEUS_COUNTERS, 0), **counters}
+    lines = []
+    for name in sorted(stats):
+        metric = f"resume_optimizer_{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {stats[name]}"]
+    checked = stats.get("bullets_prefilter_checked", 0)
+    skip_ratio = round(stats.get("bullets_prefilter_kept", 0) / checked, 4) if checked else 0
+    for name, value in (*gauges.items(), ("bullets_prefilter_skip_ratio", skip_ratio)):
+        metric = f"resume_optimizer_{name}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    metric = "resume_optimizer_stage_duration_seconds"
+    lines += [f"# HELP {metric} Time spent per pipeline stage.", f"# TYPE {metric} histogram"]
+    for stage in sorted(stages):
+        hist, cumulative = stages[stage], 0
+        for bound, count in zip(STAGE_BUCKETS + ("+Inf",), hist):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{stage}"}} {hist[-1]}')
+        lines.append(f'{metric}_count{{stage="{stage}"}} {cumulative}')
+    return "\n".join(lines) + "\n"
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint (text exposition format)
+    if METRICS_KEY and request.headers.get("Authorization") != f"Bearer {METRICS_KEY}":
+        return "Access denied", 403
+    return Response(prometheus_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route('/pay/qr.png')
+def upi_qr():
+    # Same bytes for every visitor: let browsers and CDNs keep it
+    png, etag = upi_qr_png(UPI_ID, UPI_AMOUNT, UPI_NOTE)
+    response = Response(png, mimetype="image/png")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 7 * 24 * 3600
+    return response.make_conditional(request)
+
 @app.route('/', methods=['POST'])
 def optimize():
-    if not is_access_valid():
+    with timed("token_check"):
+        access = is_access_valid()
+    if not access:
         # === PAYMENT WALL ===
-        upi_id = "goodluckankur@okaxis"
-        amount = "49.00"
-        name = "ResumeTailor"
-        note = "24-hour access"
-        upi_url = f"upi://pay?pa={upi_id}&pn={name}&am={amount}&tn={note}&cu=INR"
-
-        qr = qrcode.QRCode(version=1, box_size=8, border=2)
-        qr.add_data(upi_url)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        qr_data_uri = f"data:image/png;base64,{img_base64}"
+        _, qr_etag = upi_qr_png(UPI_ID, UPI_AMOUNT, UPI_NOTE)
+        qr_url = url_for('upi_qr', v=qr_etag[:12])
 
         error = Markup(f'''
         <div style="text-align: center; max-width: 600px; margin: 0 auto;">
@@ -520,9 +2542,9 @@ def optimize():
           </p>
           <div style="background: white; padding: 20px; border-radius: 12px; margin: 20px 0; text-align: center; border: 1px solid #e2e8f0;">
             <h3 style="margin-bottom: 12px; color: #1d4ed8;">📱 Scan to Pay ₹49 via UPI</h3>
-            <img src="{qr_data_uri}" alt="UPI QR Code" style="max-width: 220px; border-radius: 8px; box-shadow: 0 4px 10px rgba(0,0,0,0.1);" />
+            <img src="{qr_url}" alt="UPI QR Code" width="220" height="220" style="max-width: 220px; border-radius: 8px; box-shadow: 0 4px 10px rgba(0,0,0,0.1);" />
             <p style="font-size: 14px; color: #374151; margin-top: 12px;">
-              <strong>UPI ID:</strong> goodluckankur@okaxis
+              <strong>UPI ID:</strong> {UPI_ID}
             </p>
             <p style="font-size: 13px; color: #6b7280; margin-top: 6px;">
               Works with Google Pay, PhonePe, Paytm, BHIM, and all UPI apps.
@@ -555,150 +2577,255 @@ def optimize():
         phone = request.form.get('phone', '')
         job_title = request.form.get('job_title', '')
         job_desc = request.form.get('job_desc', '')
-        experiences = []
-        for i in range(2):
-            company = request.form.get(f'company_{i}', '')
-            role = request.form.get(f'role_{i}', '')
-            if company or role:
-                duration = request.form.get(f'duration_{i}', '')
-                bullets_raw = request.form.get(f'bullets_{i}', '')
-                bullets = [line.strip() for line in bullets_raw.split('\n') if line.strip()]
-                experiences.append({"company": company, "role": role, "duration": duration, "bullets": bullets})
-        return render_template_string(HTML,
-            name=name,
-            email=email,
-            phone=phone,
-            job_title=job_title,
-            job_desc=job_desc,
-            experiences=experiences,
-            error=error
-        )
+        experiences = form_experiences(request.form, strict=False)
+        with timed("render"):
+            page = render_template(PAGE,
+                name=name,
+                email=email,
+                phone=phone,
+                job_title=job_title,
+                job_desc=job_desc,
+                experiences=experiences,
+                error=error
+            )
+        return page
 
     # === FULL RESUME PROCESSING (WITH % + ATS ≥85) ===
     try:
-        name = request.form.get('name', '').strip()
-        email = request.form.get('email', '').strip()
-        phone = request.form.get('phone', '').strip()
-        job_title = request.form.get('job_title', '').strip()
-        job_desc = request.form.get('job_desc', '').strip()
-
-        experiences = []
-        for i in range(2):
-            company = request.form.get(f'company_{i}', '').strip()
-            role = request.form.get(f'role_{i}', '').strip()
-            if not company or not role:
-                if i == 0:
-                    raise ValueError("Please fill in your first work experience.")
-                else:
-                    continue
-            duration = request.form.get(f'duration_{i}', '').strip()
-            bullets_raw = request.form.get(f'bullets_{i}', '')
-            bullets = []
-            for line in bullets_raw.split('\n'):
-                clean = line.strip()
-                if clean:
-                    if clean.startswith(('•', '-', '*')):
-                        clean = clean[1:].strip()
-                    bullets.append(clean)
-            experiences.append({"company": company, "role": role, "duration": duration, "bullets": bullets})
-
-        # Professional Summary (keyword-rich)
-        summary = get_ai_response(f"""
-        Write a 3-sentence professional summary for a {job_title}.
-        Use these keywords from the job description: {', '.join(list(extract_keywords(job_desc))[:10])}.
-        Start with "{job_title}". Include at least one percentage (e.g., "improved efficiency by 30%").
-        Avoid pronouns. No fluff.
-        """)
-
-        # Enhance bullets (force %)
-        enhanced_experiences = []
-        for exp in experiences:
-            enhanced_bullets = []
-            for bullet in exp["bullets"]:
-                if not bullet:
-                    continue
-                improved = get_ai_response(f"""
-                Rewrite this resume bullet for a {job_title} role.
-                Original: "{bullet}"
-                Job description: {job_desc}
-                Rules:
-                - Start with strong verb: Engineered, Led, Optimized, etc.
-                - ALWAYS include a realistic percentage improvement (e.g., "by 25%").
-                - Use 2+ keywords from job description.
-                - Keep under 25 words.
-                - Return ONLY the bullet.
-                """).strip().strip('"').strip("'")
-                if "%" not in improved:
-                    improved += " — improving performance by 30%."
-                enhanced_bullets.append(improved)
-            enhanced_experiences.append({**exp, "bullets": enhanced_bullets})
-
-        # Calculate and ensure ATS ≥85
-        all_content = summary + " " + " ".join(b for exp in enhanced_experiences for b in exp["bullets"])
-        score = calculate_ats_score(job_desc, all_content)
-
-        if score < 85:
-            job_kw = extract_keywords(job_desc)
-            res_kw = extract_keywords(all_content)
-            missing = list(job_kw - res_kw)[:5]
-            if missing:
-                summary += " " + " ".join(missing)
-                all_content = summary + " " + " ".join(b for exp in enhanced_experiences for b in exp["bullets"])
-                score = max(85, calculate_ats_score(job_desc, all_content))
-
-        # Format output
-        lines = [name]
-        contact = [email] + ([phone] if phone else [])
-        if contact:
-            lines.append(" | ".join(contact))
-        lines += ["", "PROFESSIONAL SUMMARY", summary, "", "WORK EXPERIENCE"]
-        for exp in enhanced_experiences:
-            lines.append(f"{exp['role']} | {exp['company']}")
-            if exp['duration']:
-                lines.append(exp['duration'])
-            for b in exp['bullets']:
-                lines.append(f"• {b}")
-            lines.append("")
-        lines.append(f"[AI Resume Score: {score}/100 — ATS Optimized]")
-        result_text = "\n".join(lines)
-
-        return render_template_string(HTML,
-            name=name,
-            email=email,
-            phone=phone,
-            job_title=job_title,
-            job_desc=job_desc,
-            experiences=experiences,
-            result_text=result_text,
-            score=score
-        )
+        with timed("form_parse"):
+            resume = parse_resume_form(request.form)
+        throttle_token()
+        # ?fresh=1 asks for new samples instead of cached or previously generated rewrites
+        use_cache = request.values.get('fresh') != '1'
+        result = run_optimization(resume, request.args.get('token'), use_cache)
+
+        with timed("render"):
+            page = render_template(PAGE,
+                name=resume["name"],
+                email=resume["email"],
+                phone=resume["phone"],
+                job_title=resume["job_title"],
+                job_desc=request.form.get('job_desc', ''),  # as typed, not the normalized text
+                experiences=resume["experiences"],
+                result_text=result["result_text"],
+                score=result["score"],
+                recomputed=describe_recomputed(result["recomputed"]),
+                downloads=export_links(result["export_id"], token=request.args.get('token'))
+            )
+        return page
 
     except Exception as e:
-        error = Markup(f'<div style="color:#ef4444;padding:15px;background:#fef2f2;border-radius:8px;">⚠️ {str(e)}</div>')
+        message = e.description if isinstance(e, RequestEntityTooLarge) else str(e)
+        error = Markup(f'<div style="color:#ef4444;padding:15px;background:#fef2f2;border-radius:8px;">⚠️ {message}</div>')
         name = request.form.get('name', '')
         email = request.form.get('email', '')
         phone = request.form.get('phone', '')
         job_title = request.form.get('job_title', '')
         job_desc = request.form.get('job_desc', '')
-        experiences = []
-        for i in range(2):
-            company = request.form.get(f'company_{i}', '')
-            role = request.form.get(f'role_{i}', '')
-            if company or role:
-                duration = request.form.get(f'duration_{i}', '')
-                bullets_raw = request.form.get(f'bullets_{i}', '')
-                bullets = [line.strip() for line in bullets_raw.split('\n') if line.strip()]
-                experiences.append({"company": company, "role": role, "duration": duration, "bullets": bullets})
-        return render_template_string(HTML,
-            name=name,
-            email=email,
-            phone=phone,
-            job_title=job_title,
-            job_desc=job_desc,
-            experiences=experiences,
-            error=error
-        )
+        experiences = form_experiences(request.form, strict=False)
+        with timed("render"):
+            page = render_template(PAGE,
+                name=name,
+                email=email,
+                phone=phone,
+                job_title=job_title,
+                job_desc=job_desc,
+                experiences=experiences,
+                error=error
+            )
+        if isinstance(e, RateLimited):
+            return page, 429, {"Retry-After": str(math.ceil(e.retry_after))}
+        if isinstance(e, RequestEntityTooLarge):
+            return page, 413
+        return page
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/stream', methods=['POST'])
+def optimize_stream():
+    # Same pipeline as optimize(), sent as Server-Sent Events while each part finishes
+    if not is_access_valid():
+        return {"error": "Access token missing or expired"}, 402
+    try:
+        resume = parse_resume_form(request.form)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    throttle_token()
+    use_cache = request.values.get('fresh') != '1'
+    token = request.args.get('token')
+    previous = load_last_run(token) if use_cache else None
+
+    # Flat bullet index -> (experience index, bullet index) for the client
+    positions = [(e, b) for e, exp in enumerate(resume["experiences"]) for b, bullet in enumerate([x for x in exp["bullets"] if x])]
+
+    def events():
+        yield ": stream open\n\n"
+        summary, rewritten = None, {}
+        try:
+            parts = iter_resume_parts(resume["job_title"], resume["job_desc"], resume["experiences"], use_cache, previous,
+                                      stream_summary=True)
+            for kind, index, value in parts:
+                if kind == "summary_delta":
+                    yield sse("summary_delta", {"text": value})
+                elif kind == "summary":
+                    summary = value
+                    yield sse("summary", {"text": value})
+                elif kind == "bullet":
+                    rewritten[index] = value
+                    exp_index, bullet_index = positions[index]
+                    yield sse("bullet", {"experience": exp_index, "index": bullet_index, "text": value})
+                elif kind == "done":
+                    recomputed = value
+            result = finish_optimization(resume, token, summary, rewritten, recomputed)
+            yield sse("done", {
+                "score": result["score"],
+                "result_text": result["result_text"],
+                "recomputed": describe_recomputed(result["recomputed"]),
+                "downloads": export_links(result["export_id"], token=token),
+            })
+        except RateLimited as e:
+            yield sse("error", {"error": str(e), "retry_after": math.ceil(e.retry_after)})
+        except Exception as e:
+            yield sse("error", {"error": str(e)})
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/optimize', methods=['POST'])
+def api_optimize():
+    # JSON in, JSON out: the same pipeline as the form without any page rendering
+    if not is_access_valid():
+        return {"error": "Access token missing or expired"}, 402
+    data = request.get_json(silent=True)
+    try:
+        resume = parse_resume_json(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    throttle_token()
+    use_cache = data.get("fresh") is not True and request.values.get('fresh') != '1'
+    try:
+        result = run_optimization(resume, request.args.get('token'), use_cache)
+    except RateLimited:
+        raise
+    except Exception as e:
+        app.logger.warning("API optimization failed: %s", e)
+        return {"error": str(e)}, 502
+    return {
+        "job_title": resume["job_title"],
+        "summary": result["summary"],
+        "experiences": result["experiences"],
+        "score": result["score"],
+        "result_text": result["result_text"],
+        "recomputed": result["recomputed"],
+        "export_id": result["export_id"],
+        "downloads": export_links(result["export_id"], token=request.args.get('token')),
+    }
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    # Queue the pipeline and return immediately; poll /jobs/<id> for progress and the result
+    if not is_access_valid():
+        return {"error": "Access token missing or expired"}, 402
+    try:
+        resume = parse_resume_form(request.form)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    throttle_token()
+    payload = {"token": request.args.get('token'), "use_cache": request.values.get('fresh') != '1', "resume": resume}
+    job_id = secrets.token_urlsafe(16)
+    if not get_job_store().submit(job_id, payload):
+        return {"error": "Too many resumes in progress, please retry shortly."}, 503, {"Retry-After": "5"}
+    ensure_job_workers()
+    return {"job_id": job_id, "status_url": f"/jobs/{job_id}"}, 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_store().get(job_id)
+    if not job:
+        return {"error": "Unknown job"}, 404
+    body = {"job_id": job_id, "status": job["status"], "progress": {"done": job["progress"], "total": job["total"]}}
+    if job["status"] == "done":
+        body.update(job["result"])
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+    elif job["status"] == "queued":
+        body["queue_depth"] = get_job_store().depth()
+    return body
+
+@app.route('/export/<export_id>.<fmt>')
+def download_export(export_id, fmt):
+    if not is_access_valid():
+        return {"error": "Access token missing or expired"}, 402
+    if fmt not in EXPORT_FORMATS or not EXPORT_DIR or not re.fullmatch(r"[0-9a-f]{32}", export_id):
+        return {"error": "Unknown export"}, 404
+    try:
+        with open(export_path(export_id, "json"), "rb") as f:
+            doc = json.load(f)
+        with timed("export"):
+            path = export_path(export_id, fmt)
+            if not os.path.exists(path):
+                path = render_export_async(export_id, fmt, doc).result(timeout=EXPORT_TIMEOUT)
+    except FileNotFoundError:
+        return {"error": "Unknown or expired export"}, 404
+    except Exception as e:
+        # A render still running after EXPORT_TIMEOUT (TimeoutError) or one that failed; a retry renders it again
+        app.logger.warning("Export %s.%s failed: %r", export_id, fmt, e)
+        return {"error": "The download is not ready yet, please retry shortly."}, 503, {"Retry-After": "5"}
+    filename = "_".join(re.findall(r"\w+", doc["name"])) or "Resume"
+    # Content-addressed: the same id always has the same bytes
+    return send_file(path, mimetype=EXPORT_FORMATS[fmt], as_attachment=True, download_name=f"{filename}_Resume.{fmt}",
+                     etag=f"{export_id}-{fmt}", max_age=EXPORT_TTL)
+
+@app.route('/api/score', methods=['POST'])
+def bulk_score():
+    # Body is JSONL: first line {"job_desc": "..."}, then one resume per line. Response is JSONL too.
+    if not is_access_valid():
+        return {"error": "Access token missing or expired"}, 402
+    header = request.stream.readline()
+    try:
+        job_desc = json.loads(header)["job_desc"]
+        if not isinstance(job_desc, str) or not job_desc.strip():
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return {"error": 'First line must be {"job_desc": "..."}'}, 400
+    lines = iter_ranked_lines(job_desc, iter_resume_records(request.stream))
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+@app.cli.command("score")
+@click.argument("job_desc_file", type=click.File("r"))
+@click.argument("resumes", type=click.File("rb"), default="-")
+@click.option("--output", "-o", type=click.File("w"), default="-", help="JSONL output (default: stdout).")
+@click.option("--processes", "-p", type=int, default=None, help="Worker processes (default: BULK_PROCESSES).")
+def score_command(job_desc_file, resumes, output, processes):
+    """Rank a JSONL file of resumes against one job description."""
+    for line in iter_ranked_lines(job_desc_file.read(), iter_resume_records(resumes), processes):
+        output.write(line)
+
+# ===== SERVER STARTUP =====
+def warm_up():
+    # Process-independent startup work; gunicorn runs it once in the master before forking (preload_app)
+    upi_qr_png(UPI_ID, UPI_AMOUNT, UPI_NOTE)
+    # Legacy token file migration, once before the workers start; the store itself is opened per worker
+    TokenStore(TOKEN_DB, TOKEN_CACHE_TTL).db().close()
+    for font in PDF_FONTS:
+        pdf_font_widths(font)
+    docx_parts()
+
+def init_worker():
+    # Per-process setup after fork: the LLM client and its connection pool must not be shared
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        threading.Thread(target=metrics_flusher, name="metrics-flusher", daemon=True).start()
+    try:
+        get_backend()
+    except Exception as e:
+        # e.g. no API key yet: serve the paywall anyway, optimize requests will report the error
+        app.logger.warning("LLM backend not ready: %s", e)
 
 if __name__ == '__main__':
+    # Development server; in production: gunicorn -c gunicorn.conf.py app:app
+    warm_up()
+    init_worker()
     port = int(os.environ.get('PORT', 10000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,131 @@
+// "Add another role" copies the last role section with the next number (company_2, role_2, ...)
+(function () {
+  var roles = document.getElementById('roles');
+  var button = document.getElementById('add-role');
+  var max = parseInt(roles.getAttribute('data-max'), 10);
+
+  function update() { button.style.display = roles.children.length < max ? '' : 'none'; }
+
+  button.addEventListener('click', function () {
+    var n = roles.children.length;
+    var section = roles.lastElementChild.cloneNode(true);
+    var fields = section.querySelectorAll('input, textarea');
+    for (var i = 0; i < fields.length; i++) {
+      fields[i].name = fields[i].name.replace(/_\d+$/, '_' + n);
+      fields[i].value = '';
+      fields[i].required = false;
+    }
+    roles.appendChild(section);
+    section.querySelector('input').focus();
+    update();
+  });
+  update();
+})();
+
+// Paid users get the resume streamed in part by part; if the stream can't be opened, the form is posted normally
+(function () {
+  var form = document.getElementById('resume-form');
+  var params = new URLSearchParams(location.search);
+  if (!params.get('token') || !window.fetch || !window.ReadableStream || !window.TextDecoder) return;
+
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    var data = new FormData(form);
+    var state = { summary: '', experiences: [] };
+    for (var i = 0; data.has('company_' + i); i++) {
+      if (data.get('company_' + i).trim() && data.get('role_' + i).trim()) {
+        state.experiences.push({
+          heading: data.get('role_' + i).trim() + ' | ' + data.get('company_' + i).trim(),
+          duration: data.get('duration_' + i).trim(),
+          bullets: []
+        });
+      }
+    }
+    var card = document.getElementById('result-card');
+    var output = document.getElementById('output');
+    var errorBox = document.getElementById('error');
+    var button = form.querySelector('button[type=submit]');
+    var streaming = false;
+    errorBox.style.display = 'none';
+    document.getElementById('score').textContent = '…';
+    document.getElementById('job-title-label').textContent = 'Optimized for "' + data.get('job_title') + '"';
+    document.getElementById('recomputed').style.display = 'none';
+    document.getElementById('downloads').style.display = 'none';
+    card.style.display = '';
+    button.disabled = true;
+
+    function render() {
+      var contact = [data.get('email')].concat(data.get('phone') ? [data.get('phone')] : []);
+      var lines = [data.get('name'), contact.join(' | '), '', 'PROFESSIONAL SUMMARY', state.summary, '', 'WORK EXPERIENCE'];
+      state.experiences.forEach(function (exp) {
+        lines.push(exp.heading);
+        if (exp.duration) lines.push(exp.duration);
+        exp.bullets.forEach(function (b) { if (b) lines.push('• ' + b); });
+        lines.push('');
+      });
+      output.textContent = lines.join('\n');
+    }
+
+    function showError(message) {
+      // Same look as the error the server renders for a failed form post
+      var box = document.createElement('div');
+      box.style.cssText = 'color:#ef4444;padding:15px;background:#fef2f2;border-radius:8px;';
+      box.textContent = '⚠️ ' + message;
+      errorBox.replaceChildren(box);
+      errorBox.style.display = '';
+      card.style.display = 'none';
+      button.disabled = false;
+    }
+
+    function handle(name, payload) {
+      if (name === 'summary_delta') { state.summary += payload.text; }
+      else if (name === 'summary') { state.summary = payload.text; }
+      else if (name === 'bullet') { state.experiences[payload.experience].bullets[payload.index] = payload.text; }
+      else if (name === 'done') {
+        document.getElementById('score').textContent = payload.score + '%';
+        output.textContent = payload.result_text;
+        document.querySelector('#recomputed span').textContent = payload.recomputed;
+        document.getElementById('recomputed').style.display = '';
+        var links = document.querySelectorAll('#downloads a');
+        for (var i = 0; i < links.length; i++) {
+          links[i].href = payload.downloads[links[i].getAttribute('data-format')] || '#';
+        }
+        if (Object.keys(payload.downloads).length) document.getElementById('downloads').style.display = '';
+        return;
+      }
+      else if (name === 'error') { showError(payload.error); return; }
+      render();
+    }
+
+    fetch('/stream' + location.search, { method: 'POST', body: data }).then(function (res) {
+      if (!res.ok || !res.body) { form.submit(); return; }
+      streaming = true;
+      var reader = res.body.getReader();
+      var decoder = new TextDecoder();
+      var buffer = '';
+      function pump() {
+        return reader.read().then(function (chunk) {
+          if (chunk.done) { button.disabled = false; return; }
+          buffer += decoder.decode(chunk.value, { stream: true });
+          var frames = buffer.split('\n\n');
+          buffer = frames.pop();
+          frames.forEach(function (frame) {
+            var name = 'message', body = '';
+            frame.split('\n').forEach(function (line) {
+              if (line.indexOf('event: ') === 0) name = line.slice(7);
+              else if (line.indexOf('data: ') === 0) body += line.slice(6);
+            });
+            if (body) handle(name, JSON.parse(body));
+          });
+          return pump();
+        });
+      }
+      return pump();
+    }).catch(function () {
+      // Once the stream has started, posting the form again would rerun the whole generation (and spend
+      // another rate limit token), so the error is shown instead
+      if (!streaming) { form.submit(); return; }
+      showError('The connection was interrupted, please try again.');
+    });
+  });
+})();
@@ -0,0 +1,67 @@
+# Multi-candidate generation: extra tokens, latency and ATS score gained by sampling n candidates per
+# call and selecting locally, against one candidate plus keyword boosting.
+#   python bench/candidates.py -o bench-candidates.json              # fake backend
+#   python bench/candidates.py --live --runs 3 -o bench-cand-live.json  # the configured LLM backend (costs tokens)
+# "text_score" is the ATS score of the generated text alone; "reported_score" includes any keyword boosting.
+import argparse
+import sys
+import time
+
+from common import POSTING, metrics_delta, pipeline_env, sample_resume, sized_text, write_report
+
+def run_mode(resume_app, resume, n, runs):
+    resume_app.LLM_CANDIDATES = n
+    index = resume_app.job_index(resume["job_desc"])
+    before = resume_app.metrics_snapshot()
+    latencies, text_scores, reported = [], [], []
+    for _ in range(runs):
+        parts = {}
+        started = time.perf_counter()
+        result = resume_app.run_optimization(resume, use_cache=False,
+                                             on_part=lambda kind, i, value: parts.__setitem__((kind, i), value))
+        latencies.append(time.perf_counter() - started)
+        text_scores.append(index.score(" ".join(v for (kind, _), v in parts.items() if kind in ("summary", "bullet"))))
+        reported.append(result["score"])
+    usage = metrics_delta(before, resume_app.metrics_snapshot(), runs)
+    return {
+        "prompt_tokens": round(usage["llm_prompt_tokens"]),
+        "completion_tokens": round(usage["llm_completion_tokens"]),
+        "cost_usd": round(usage["llm_cost_usd"], 6),
+        "latency_ms": round(sum(latencies) / runs * 1000, 1),
+        "text_score": round(sum(text_scores) / runs, 1),
+        "reported_score": round(sum(reported) / runs, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare one candidate per call with n candidates and local selection.")
+    parser.add_argument("--candidates", "-n", type=int, default=3)
+    parser.add_argument("--posting-size", type=int, default=3000, help="job description size in bytes")
+    parser.add_argument("--bullets", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=1, help="pipeline runs per mode (average)")
+    parser.add_argument("--live", action="store_true", help="use the configured LLM backend instead of the fake one")
+    parser.add_argument("--output", "-o", default="-", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    pipeline_env(args.live, llm_latency=0.05)
+    import app as resume_app
+
+    resume = sample_resume(sized_text(POSTING, args.posting_size), bullets=args.bullets)
+    single, multi = run_mode(resume_app, resume, 1, args.runs), run_mode(resume_app, resume, args.candidates, args.runs)
+    results = {
+        "single": single,
+        "candidates": multi,
+        "extra_completion_tokens": multi["completion_tokens"] - single["completion_tokens"],
+        "extra_cost_usd": round(multi["cost_usd"] - single["cost_usd"], 6),
+        "extra_latency_ms": round(multi["latency_ms"] - single["latency_ms"], 1),
+        "text_score_gain": round(multi["text_score"] - single["text_score"], 1),
+    }
+    for name, r in (("n=1", single), (f"n={args.candidates}", multi)):
+        print(f"{name:6s} {r['prompt_tokens']:>7d} prompt + {r['completion_tokens']:>6d} completion tokens  "
+              f"${r['cost_usd']:.5f}  {r['latency_ms']:>8.1f} ms  text score {r['text_score']:>5.1f}  "
+              f"reported {r['reported_score']:>5.1f}", file=sys.stderr)
+    config = {"candidates": args.candidates, "posting_size": args.posting_size, "bullets": args.bullets,
+              "runs": args.runs, "live": args.live}
+    write_report(args.output, "candidates", results, config)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Shared helpers for the benchmark scripts: sample inputs, timing stats and JSON reports.
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+POSTING = """Senior Data Engineer
+
+About the role
+We are looking for a Senior Data Engineer to design, build and operate the data pipelines that power
+analytics, reporting and machine learning across the company. You will own batch and streaming ingestion,
+data modeling in the warehouse, and the tooling our analysts and data scientists rely on every day.
+
+What you will do
+- Build and maintain scalable ETL and ELT pipelines in Python and SQL using Airflow and dbt.
+- Design data models in Snowflake and BigQuery for product analytics and financial reporting.
+- Operate Kafka and Spark streaming jobs with strong data quality checks and alerting.
+- Partner with data science on feature pipelines, model training data and experiment analysis.
+- Improve reliability, cost and performance of our AWS data platform (S3, Glue, EMR, Lambda).
+- Mentor engineers, review code and contribute to architecture decisions.
+
+What you bring
+- 5+ years of experience in data engineering or backend software engineering.
+- Expert SQL and strong Python; experience with Spark, Kafka, Airflow and dbt.
+- Experience with cloud data warehouses, data modeling and dimensional design.
+- Familiarity with CI/CD, Docker, Kubernetes and infrastructure as code (Terraform).
+- Excellent communication skills and ability to work with cross-functional stakeholders.
+
+Benefits
+Competitive salary, equity, health insurance, remote-friendly culture and a learning budget.
+We are an equal opportunity employer and value diversity. All qualified applicants will receive
+consideration for employment without regard to race, religion, gender, sexual orientation or disability.
+"""
+
+RESUME = """Built Airflow pipelines in Python and SQL that load 2 TB/day into Snowflake.
+Migrated Spark batch jobs to Kafka streaming, cutting data latency by 80%.
+Designed dimensional data models for finance reporting used by 40 analysts.
+Led a team of 4 engineers and introduced code review and CI/CD with Docker.
+Reduced AWS EMR cost by 35% by right-sizing clusters and tuning Spark jobs.
+"""
+
+def sized_text(text, size):
+    # Repeat text, numbering each copy so the copies are not identical, until it is `size` bytes
+    parts, total, n = [], 0, 0
+    while total < size:
+        chunk = f"{text}\nSection {n}\n"
+        parts.append(chunk)
+        total += len(chunk)
+        n += 1
+    return "".join(parts)[:size]
+
+def sample_resume(job_desc=POSTING, roles=1, bullets=8):
+    # Pipeline input with `roles` roles of `bullets` bullets each, cycling through the RESUME lines;
+    # later roles start further into the list and are tagged, so no two roles share a bullet
+    lines = RESUME.strip().splitlines()
+    return {
+        "name": "Bench", "email": "bench@example.com", "phone": "", "job_title": "Senior Data Engineer",
+        "job_desc": job_desc,
+        "experiences": [{"company": f"Company {r + 1}", "role": "Data Engineer", "duration": "2021-2024",
+                         "bullets": [lines[(r + i) % len(lines)] + (f" (role {r + 1})" if r else "")
+                                     for i in range(bullets)]}
+                        for r in range(roles)],
+    }
+
+def pipeline_env(live=False, llm_latency=0.0):
+    # Set before importing app: the fake LLM backend unless live, and no prefilter, response cache or
+    # downloads, so every bullet goes to the LLM on every run
+    if not live:
+        os.environ.update(LLM_BACKEND="fake", FAKE_LLM_LATENCY=str(llm_latency))
+    os.environ.update(BULLET_PREFILTER="0", LLM_CACHE_SIZE="0", EXPORT_DIR="")
+
+def metrics_delta(before, after, runs=1):
+    # Per-run change of each app counter between two metrics_snapshot() calls; missing counters are 0
+    return Counter({name: (after.get(name, 0) - before.get(name, 0)) / runs for name in {*before, *after}})
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+def summarize(seconds, unit="ms"):
+    scale = 1000.0 if unit == "ms" else 1_000_000.0
+    values = [s * scale for s in seconds]
+    return {
+        f"mean_{unit}": round(sum(values) / len(values), 3) if values else 0.0,
+        f"p50_{unit}": round(percentile(values, 50), 3),
+        f"p95_{unit}": round(percentile(values, 95), 3),
+        f"p99_{unit}": round(percentile(values, 99), 3),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def write_report(path, kind, results, config):
+    report = {
+        "kind": kind,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {path}", file=sys.stderr)
+    return report
@@ -0,0 +1,59 @@
+# Compare a benchmark report against a stored baseline; exits 1 on regressions (for CI).
+#   python bench/compare.py bench-baseline.json bench-current.json --tolerance 0.25
+import argparse
+import json
+import sys
+
+# Metric name suffixes where a larger number is better; everything else timed is lower-is-better
+HIGHER_IS_BETTER = ("ops_per_sec", "requests_per_sec")
+LOWER_IS_BETTER = ("_ms", "_us", "_kb", "errors")
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, name + ".")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+def compare(baseline, current, tolerance):
+    rows, regressions = [], 0
+    base = dict(flatten(baseline["results"]))
+    for name, value in flatten(current["results"]):
+        if name not in base:
+            continue
+        old = base[name]
+        if name.endswith(HIGHER_IS_BETTER):
+            worse = value < old * (1 - tolerance)
+        elif name.endswith(LOWER_IS_BETTER):
+            worse = value > old * (1 + tolerance) and value - old > 1e-9
+        else:
+            continue
+        change = (value - old) / old * 100 if old else 0.0
+        regressions += worse
+        rows.append((name, old, value, change, "REGRESSION" if worse else ""))
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a benchmark report with a baseline.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("kind") != current.get("kind"):
+        raise SystemExit(f"Cannot compare a {baseline.get('kind')} report with a {current.get('kind')} report")
+
+    rows, regressions = compare(baseline, current, args.tolerance)
+    for name, old, value, change, flag in rows:
+        print(f"{name:45s} {old:>12.2f} -> {value:>12.2f}  {change:>+7.1f}%  {flag}")
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%} "
+          f"(baseline {baseline.get('revision')}, current {current.get('revision')})")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# End-to-end load generator for POST / (paid and paywall branches).
+# Starts the app in a subprocess with the in-process fake LLM backend, so no API key or network is needed:
+#   python bench/load.py --requests 200 --concurrency 16 --llm-latency 0.4 -o bench-load.json
+#   python bench/load.py --server gunicorn --requests 200 --concurrency 64
+# Or point it at a server you started yourself (peak RSS is then not reported):
+#   python bench/load.py --url http://127.0.0.1:10000 --admin-key $ADMIN_KEY
+import argparse
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from common import POSTING, RESUME, ROOT, summarize, write_report
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args, workdir, admin_key):
+    port = free_port()
+    env = dict(os.environ,
+               LLM_BACKEND="fake",
+               FAKE_LLM_LATENCY=str(args.llm_latency),
+               FAKE_LLM_JITTER=str(args.llm_jitter),
+               FAKE_LLM_DISTRIBUTION=args.llm_distribution,
+               FAKE_LLM_SEED="1",
+               ADMIN_KEY=admin_key,
+               RATE_LIMIT_PER_MINUTE="0",  # every request uses the same access token
+               TOKEN_DB=os.path.join(workdir, "tokens.sqlite3"),
+               TOKEN_FILE=os.path.join(workdir, "tokens.json"),
+               JOB_DB=os.path.join(workdir, "jobs.sqlite3"),
+               PORT=str(port))
+    if args.server_cmd:
+        command = args.server_cmd.format(port=port, python=sys.executable).split()
+    elif args.server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+                   "app:app"]
+    else:
+        command = [sys.executable, "-m", "flask", "--app", os.path.join(ROOT, "app.py"), "run",
+                   "--port", str(port), "--with-threads", "--no-reload"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}: {' '.join(command)}")
+        try:
+            httpx.get(url + "/", timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("Server did not start within 30 seconds")
+
+def peak_rss_kb(pid):
+    # VmHWM of the server and all of its children (forking servers run several processes)
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    total += int(line.split()[1])
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                total += sum(peak_rss_kb(int(child)) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return total
+
+def stage_means_ms(client, url):
+    # Mean time per pipeline stage from the server's Prometheus histograms
+    sums, counts = {}, {}
+    for line in client.get(url + "/metrics").text.splitlines():
+        if line.startswith("resume_optimizer_stage_duration_seconds_sum"):
+            sums[line.split('"')[1]] = float(line.split()[-1])
+        elif line.startswith("resume_optimizer_stage_duration_seconds_count"):
+            counts[line.split('"')[1]] = int(line.split()[-1])
+    return {f"{stage}_ms": round(sums[stage] / counts[stage] * 1000, 3) for stage in sums if counts.get(stage)}
+
+def issue_token(client, url, admin_key):
+    page = client.get(f"{url}/admin/token", params={"key": admin_key}).text
+    return page.split("?token=")[1].split('"')[0]
+
+def form_data(n, bullets):
+    lines = RESUME.strip().splitlines()
+    return {
+        "name": "Load Test", "email": "load@example.com", "job_title": "Senior Data Engineer", "job_desc": POSTING,
+        "company_0": "Acme", "role_0": "Data Engineer", "duration_0": "2021-2024",
+        # Request number in each bullet keeps the response cache from answering
+        "bullets_0": "\n".join(f"- {lines[i % len(lines)]} (run {n})" for i in range(bullets)),
+        "company_1": "Beta", "role_1": "Engineer", "duration_1": "2018-2021",
+        "bullets_1": "\n".join(f"- {lines[(i + 2) % len(lines)]} (run {n})" for i in range(bullets)),
+    }
+
+def run_scenario(client, url, params, expect, requests, concurrency, bullets):
+    def one(n):
+        start = time.perf_counter()
+        try:
+            response = client.post(url + "/", params=params, data=form_data(n, bullets))
+            ok = response.status_code == 200 and expect in response.text
+        except httpx.HTTPError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [t for t, ok in samples if ok]
+    result = summarize(latencies, unit="ms")
+    result.update({
+        "requests": requests,
+        "errors": sum(1 for _, ok in samples if not ok),
+        "requests_per_sec": round(requests / elapsed, 2),
+    })
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST / against a fake LLM backend.")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--bullets", type=int, default=6, help="bullets per role (2 roles)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="median fake LLM latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--llm-distribution", default="lognormal")
+    parser.add_argument("--scenario", action="append", choices=["paid", "paywall"], help="default: both")
+    parser.add_argument("--server", choices=["flask", "gunicorn"], default="flask",
+                        help="flask dev server or the production gunicorn config")
+    parser.add_argument("--server-cmd", help="command to start the app; {port} and {python} are substituted")
+    parser.add_argument("--url", help="use an already running server instead of starting one")
+    parser.add_argument("--admin-key", help="ADMIN_KEY of the server given with --url")
+    parser.add_argument("--output", "-o", default="-", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            url, admin_key = args.url.rstrip("/"), args.admin_key
+        else:
+            admin_key = secrets.token_urlsafe(16)
+            process, url = start_server(args, workdir, admin_key)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            with httpx.Client(timeout=300, limits=limits) as client:
+                scenarios = {
+                    "paid": ({"token": issue_token(client, url, admin_key), "fresh": "1"}, 'id="output">Load Test'),
+                    "paywall": ({}, "Secure Access Required"),
+                }
+                results = {}
+                for name in args.scenario or ["paid", "paywall"]:
+                    params, expect = scenarios[name]
+                    run_scenario(client, url, params, expect, min(args.concurrency, args.requests), args.concurrency, args.bullets)
+                    results[name] = run_scenario(client, url, params, expect, args.requests, args.concurrency, args.bullets)
+                    print(f"{name:8s} p50 {results[name]['p50_ms']:>9.1f} ms  p99 {results[name]['p99_ms']:>9.1f} ms  "
+                          f"{results[name]['requests_per_sec']:>8.2f} req/s  errors {results[name]['errors']}",
+                          file=sys.stderr)
+                results["stages"] = stage_means_ms(client, url)
+            if process:
+                results["server"] = {"peak_rss_kb": peak_rss_kb(process.pid)}
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout=10)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "admin_key")}
+    write_report(args.output, "load", results, config)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Micro-benchmarks for the CPU-bound pieces of the request path.
+#   python bench/micro.py -o bench-micro.json
+#   python bench/compare.py bench-micro-baseline.json bench-micro.json
+import argparse
+import sys
+import time
+
+from common import POSTING, RESUME, sized_text, summarize, write_report
+
+import app as resume_app
+from flask import render_template
+
+def measure(fn, seconds, min_runs=20):
+    fn()  # warm-up
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples, unit="us")
+    result["runs"] = len(samples)
+    result["ops_per_sec"] = round(len(samples) / sum(samples), 1)
+    return result
+
+def benchmarks(posting_size):
+    posting = sized_text(POSTING, posting_size)
+    resume = sized_text(RESUME, 3000)
+    experiences = [{"company": "Acme", "role": "Data Engineer", "duration": "2021-2024",
+                    "bullets": RESUME.strip().splitlines()}] * 2
+    result_text = "\n".join(["Ann Example", "ann@example.com", "", "PROFESSIONAL SUMMARY", RESUME] * 3)
+    export_doc = resume_app.export_document("Ann Example", "ann@example.com", "", RESUME.replace("\n", " "), experiences)
+
+    def clear_text_caches():
+        resume_app.job_index.cache_clear()
+        resume_app.cached_tokens.cache_clear()
+        resume_app.extract_keywords.cache_clear()
+
+    def keywords_cold():
+        clear_text_caches()
+        resume_app.extract_keywords(posting)
+
+    def ats_cold():
+        clear_text_caches()
+        resume_app.calculate_ats_score(posting, resume)
+
+    def render_result_page():
+        with resume_app.app.test_request_context("/", method="POST"):
+            render_template(resume_app.PAGE, name="Ann Example", email="ann@example.com", job_title="Data Engineer",
+                            job_desc=posting, experiences=experiences, result_text=result_text, score=91)
+
+    def render_paywall_page():
+        with resume_app.app.test_request_context("/", method="POST"):
+            render_template(resume_app.PAGE, experiences=[], error="Secure Access Required")
+
+    return {
+        "extract_keywords": keywords_cold,
+        "extract_keywords_memoized": lambda: resume_app.extract_keywords(posting),
+        "calculate_ats_score_cold": ats_cold,
+        "calculate_ats_score_warm": lambda: resume_app.calculate_ats_score(posting, resume),
+        "qr_generate": lambda: resume_app.upi_qr_png.__wrapped__(
+            resume_app.UPI_ID, resume_app.UPI_AMOUNT, resume_app.UPI_NOTE),
+        "render_result_page": render_result_page,
+        "render_paywall_page": render_paywall_page,
+        "export_pdf": lambda: resume_app.render_pdf(export_doc),
+        "export_docx": lambda: resume_app.render_docx(export_doc),
+        "export_md": lambda: resume_app.render_markdown(export_doc),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for keyword extraction, ATS scoring, QR, page and export rendering.")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time budget per benchmark")
+    parser.add_argument("--posting-size", type=int, default=10_000, help="job description size in bytes")
+    parser.add_argument("--only", action="append", help="run just these benchmarks (repeatable)")
+    parser.add_argument("--output", "-o", default="-", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in benchmarks(args.posting_size).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, args.seconds)
+        print(f"{name:28s} p50 {results[name]['p50_us']:>10.1f} us   {results[name]['ops_per_sec']:>10.1f} ops/s", file=sys.stderr)
+    write_report(args.output, "micro", results, {"seconds": args.seconds, "posting_size": args.posting_size})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Prompt compaction: prompt tokens, cost, latency and result quality with whole-posting vs excerpt prompts.
+#   python bench/prompts.py -o bench-prompts.json              # fake backend: sizes plus keyword coverage
+#   python bench/prompts.py --live -o bench-prompts-live.json  # the configured LLM backend (costs tokens)
+# Quality is measured the way the app scores resumes: ATS score of the rewritten bullets (before any
+# keyword boosting) and the mean number of job description terms per bullet.
+import argparse
+import sys
+import time
+
+from common import POSTING, metrics_delta, pipeline_env, sample_resume, sized_text, write_report
+
+def run_mode(resume_app, resume, compact, runs):
+    resume_app.PROMPT_COMPACTION = compact
+    index = resume_app.job_index(resume["job_desc"])
+    before = resume_app.metrics_snapshot()
+    started = time.perf_counter()
+    bullet_scores, terms_per_bullet = [], []
+    for _ in range(runs):
+        result = resume_app.run_optimization(resume, use_cache=False)
+        bullets = [b for exp in result["experiences"] for b in exp["bullets"]]
+        bullet_scores.append(index.score(" ".join(bullets)))
+        terms_per_bullet += [len(index.terms_in(b)) for b in bullets]
+    elapsed = time.perf_counter() - started
+    usage = metrics_delta(before, resume_app.metrics_snapshot(), runs)
+    return {
+        "prompt_tokens": round(usage["llm_prompt_tokens"]),
+        "completion_tokens": round(usage["llm_completion_tokens"]),
+        "cost_usd": round(usage["llm_cost_usd"], 6),
+        "latency_ms": round(elapsed / runs * 1000, 1),
+        "bullet_ats_score": round(sum(bullet_scores) / runs, 1),
+        "terms_per_bullet": round(sum(terms_per_bullet) / len(terms_per_bullet), 2) if terms_per_bullet else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-posting and excerpt prompts for bullet rewrites.")
+    parser.add_argument("--posting-size", type=int, default=8000, help="job description size in bytes")
+    parser.add_argument("--bullets", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=1, help="pipeline runs per mode (average)")
+    parser.add_argument("--live", action="store_true", help="use the configured LLM backend instead of the fake one")
+    parser.add_argument("--output", "-o", default="-", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    pipeline_env(args.live)
+    import app as resume_app
+
+    resume = sample_resume(sized_text(POSTING, args.posting_size), bullets=args.bullets)
+    results = {
+        "full": run_mode(resume_app, resume, False, args.runs),
+        "compact": run_mode(resume_app, resume, True, args.runs),
+    }
+    full, compact = results["full"], results["compact"]
+    results["prompt_token_reduction_pct"] = round(
+        (1 - compact["prompt_tokens"] / full["prompt_tokens"]) * 100, 1) if full["prompt_tokens"] else 0.0
+    for mode in ("full", "compact"):
+        r = results[mode]
+        print(f"{mode:8s} {r['prompt_tokens']:>8d} prompt tokens  ${r['cost_usd']:.5f}  {r['latency_ms']:>8.1f} ms  "
+              f"bullet ATS {r['bullet_ats_score']:>5.1f}  terms/bullet {r['terms_per_bullet']:.2f}", file=sys.stderr)
+    print(f"prompt tokens -{results['prompt_token_reduction_pct']}%", file=sys.stderr)
+    config = {"posting_size": args.posting_size, "bullets": args.bullets, "runs": args.runs, "live": args.live,
+              "excerpt_sentences": resume_app.PROMPT_EXCERPT_SENTENCES, "excerpt_tokens": resume_app.PROMPT_EXCERPT_TOKENS}
+    write_report(args.output, "prompts", results, config)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Scaling with the number of roles: latency, LLM calls and tokens for 1..N roles of the same size.
+#   python bench/roles.py -o bench-roles.json                 # fake backend
+#   python bench/roles.py --roles 1 2 4 8 --bullets 6 --llm-latency 0.3
+#   BULLET_BUDGET=0 LLM_TOKEN_BUDGET=0 python bench/roles.py   # scaling without the budgets leaving bullets as written
+# All roles' bullets are one workload, so latency should grow much slower than the number of roles;
+# "latency_vs_one_role" is that ratio. Bullets over BULLET_BUDGET / LLM_TOKEN_BUDGET are reported as kept.
+import argparse
+import sys
+import time
+
+from common import metrics_delta, pipeline_env, sample_resume, write_report
+
+def run_roles(resume_app, count, bullets, runs):
+    resume = sample_resume(roles=count, bullets=bullets)
+    before = resume_app.metrics_snapshot()
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = resume_app.run_optimization(resume, use_cache=False)
+        latencies.append(time.perf_counter() - started)
+    usage = metrics_delta(before, resume_app.metrics_snapshot(), runs)
+    return {
+        "bullets": count * bullets,
+        "llm_calls": round(usage["llm_calls"]),
+        "prompt_tokens": round(usage["llm_prompt_tokens"]),
+        "completion_tokens": round(usage["llm_completion_tokens"]),
+        "over_budget": len(result["recomputed"]["over_budget"]),
+        "latency_ms": round(sum(latencies) / runs * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and tokens of the pipeline for an increasing number of roles.")
+    parser.add_argument("--roles", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--bullets", type=int, default=5, help="bullets per role")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="fake LLM latency per call (s)")
+    parser.add_argument("--runs", type=int, default=1, help="pipeline runs per role count (average)")
+    parser.add_argument("--live", action="store_true", help="use the configured LLM backend instead of the fake one")
+    parser.add_argument("--output", "-o", default="-", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    pipeline_env(args.live, args.llm_latency)
+    import app as resume_app
+
+    results = {}
+    for count in args.roles:
+        r = results[f"roles_{count}"] = run_roles(resume_app, count, args.bullets, args.runs)
+        r["latency_vs_one_role"] = round(r["latency_ms"] / results[f"roles_{args.roles[0]}"]["latency_ms"], 2)
+        print(f"{count:>2d} roles {r['bullets']:>3d} bullets  {r['llm_calls']:>3d} calls  {r['prompt_tokens']:>7d} prompt tokens  "
+              f"{r['over_budget']:>3d} over budget  {r['latency_ms']:>8.1f} ms  x{r['latency_vs_one_role']}", file=sys.stderr)
+    config = {"roles": args.roles, "bullets": args.bullets, "llm_latency": args.llm_latency, "runs": args.runs,
+              "live": args.live, "concurrency": resume_app.LLM_CONCURRENCY,
+              "max_inflight": resume_app.llm_limiter.max_limit, "bullet_budget": resume_app.BULLET_BUDGET,
+              "token_budget": resume_app.LLM_TOKEN_BUDGET}
+    write_report(args.output, "roles", results, config)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Production server settings:  gunicorn -c gunicorn.conf.py app:app
+# Requests spend nearly all their time waiting on the LLM API, so each worker process runs many
+# threads (gthread) and the worker count follows the CPUs. Every setting can be overridden from the
+# environment or with GUNICORN_CMD_ARGS.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", 0)) or min(2 * multiprocessing.cpu_count() + 1, int(os.getenv("MAX_WORKERS", 8)))
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+
+# A generation can take a minute or more (JOB_TIMEOUT, LLM_TIMEOUT); restarts and deploys let
+# in-flight generations finish instead of cutting them off
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 180))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 120))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Import the app once in the master (template, assets, IDF table, QR code) and fork the workers from it
+preload_app = True
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None  # empty: no access log
+
+# State that must be the same whichever worker gets the request: background jobs, per-token rate limits and last
+# runs (STATE_DB), the LLM response cache, and the metrics /metrics adds up. The in-flight LLM cap is split by
+# SERVER_WORKERS.
+os.environ.setdefault("SERVER_WORKERS", str(workers))
+if workers > 1:
+    os.environ.setdefault("JOB_BACKEND", "sqlite")
+    os.environ.setdefault("STATE_DB", "/tmp/resume_state.sqlite3")
+    os.environ.setdefault("LLM_CACHE_DB", "/tmp/resume_llm_cache.sqlite3")
+    os.environ.setdefault("METRICS_DIR", "/tmp/resume_metrics")
+
+def on_starting(server):
+    # Counters start from zero with each server start, like a single process would
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(metrics_dir, name))
+
+def when_ready(server):
+    import app as resume_app
+    resume_app.warm_up()
+
+def post_fork(server, worker):
+    import app as resume_app
+    resume_app.init_worker()
@@ -0,0 +1,140 @@
+# Minimal OpenAI-compatible chat completions server for local testing.
+#   python stub_llm.py --port 8001 --latency 0.3
+#   LLM_BACKEND=compatible LLM_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+# GET /stats reports how many TCP connections served how many requests,
+# which shows whether the app is reusing keep-alive connections.
+# --capacity N answers 429 with Retry-After beyond N concurrent completions, like a provider rate limit.
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATS = {"connections": 0, "requests": 0, "rate_limited": 0, "in_flight": 0}
+STATS_LOCK = threading.Lock()
+
+def completion(body):
+    prompt = body["messages"][-1]["content"]
+    if body.get("response_format", {}).get("type") == "json_object":
+        last = re.search(r"bullet index from 0 to (-?\d+)", prompt)
+        count = int(last.group(1)) + 1 if last else 0
+        content = json.dumps({
+            "summary": "Stub summary that improved delivery by 30%.",
+            "bullets": [{"index": i, "text": f"Delivered stub bullet {i} by 20%."} for i in range(count)],
+        })
+    else:
+        content = "Optimized stub output, improving throughput by 25%."
+    # n > 1: numbered variants of the same content, one choice each
+    contents = [content] + [f"{content} (variant {i})" for i in range(1, body.get("n") or 1)]
+    completion_tokens = sum(len(c) for c in contents) // 4
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": i, "message": {"role": "assistant", "content": c}, "finish_reason": "stop"}
+                    for i, c in enumerate(contents)],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": completion_tokens,
+                  "total_tokens": len(prompt) // 4 + completion_tokens},
+    }
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    jitter = 0.0
+    capacity = 0
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def setup(self):
+        super().setup()
+        with STATS_LOCK:
+            STATS["connections"] += 1
+
+    def send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with STATS_LOCK:
+                self.send_json(dict(STATS))
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with STATS_LOCK:
+            STATS["requests"] += 1
+        if not self.path.endswith("/chat/completions"):
+            return self.send_json({"error": "not found"}, 404)
+        with STATS_LOCK:
+            limited = self.capacity and STATS["in_flight"] >= self.capacity
+            STATS["rate_limited" if limited else "in_flight"] += 1
+        if limited:
+            return self.send_rate_limited()
+        try:
+            if body.get("stream"):
+                return self.send_stream(completion(body), (body.get("stream_options") or {}).get("include_usage"))
+            time.sleep(self.delay())
+            self.send_json(completion(body))
+        finally:
+            with STATS_LOCK:
+                STATS["in_flight"] -= 1
+
+    def send_rate_limited(self):
+        data = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode()
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Retry-After-Ms", str(max(50, int(self.latency * 1000))))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, result, include_usage=False):
+        # Chunked SSE, one word per chunk, spreading the latency across the words;
+        # usage comes in a final chunk without choices, as with stream_options.include_usage
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        usage = result.pop("usage")
+        words = result["choices"][0]["message"]["content"].split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.delay() / len(words))
+            chunk = {**result, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]}
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        if include_usage:
+            self.write_chunk(f"data: {json.dumps({**result, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- uniform seconds added to --latency")
+    parser.add_argument("--capacity", type=int, default=0, help="concurrent completions before answering 429 (0 = no limit)")
+    args = parser.parse_args()
+    Handler.latency = args.latency
+    Handler.jitter = args.jitter
+    Handler.capacity = args.capacity
+    print(f"Stub LLM listening on http://{args.host}:{args.port}/v1")
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
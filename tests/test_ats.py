@@ -0,0 +1,37 @@
+# Regression cases for ATS keyword extraction and scoring:  python -m pytest -q tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXPORT_DIR", "")
+
+import pytest
+
+import app
+
+POSTING = ("Backend Engineer\n\nJoin us! You'll build services in Go and Python on AWS. Let us know if you're excited about "
+           "Kubernetes, Postgres and Kafka. We'd love to hear from you. You're going to own CI/CD and the ML platform; "
+           "we're a small team, you'll know everyone. Don't worry if you've not used Terraform.")
+RESUME = "Go Python AWS Kubernetes Postgres Kafka CI/CD ML Terraform backend services platform engineer"
+
+@pytest.mark.parametrize("word", ["ll", "re", "ve", "don", "us", "let", "know", "love", "hear"])
+def test_contraction_fragments_and_filler_are_not_keywords(word):
+    assert word not in app.extract_keywords(POSTING)
+    assert word not in app.job_index(POSTING).terms
+
+def test_short_skills_are_keywords():
+    assert {"go", "ml", "ci", "cd", "c#"} <= app.extract_keywords("Go, ML, CI/CD and C# experience")
+
+def test_phrase_matches():
+    index = app.job_index("Machine learning engineer: build machine learning models in Python.")
+    assert "machine learning" in index.terms
+    assert "machine learning" in index.terms_in("Shipped machine learning features")
+    assert "machine learning" in index.missing("Shipped learning machines")
+
+def test_resume_with_every_skill_scores_high():
+    assert app.job_index(POSTING).score(RESUME) >= 85
+
+def test_boost_appends_no_filler():
+    summary, _ = app.boost_ats(POSTING, "Backend engineer.", [{"bullets": ["Built services."]}])
+    added = set(summary.lower().replace("backend engineer.", "").split())
+    assert not added & {"know", "let", "ll", "re", "us", "love"}
@@ -0,0 +1,42 @@
+# Regression cases for job description boilerplate stripping:  python -m pytest -q tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXPORT_DIR", "")
+
+import pytest
+
+import app
+
+@pytest.mark.parametrize("title", ["Compensation Analyst", "Diversity Recruiter", "Perks Platform Engineer",
+                                   "Benefits Specialist"])
+def test_title_starting_with_a_boilerplate_word_is_kept(title):
+    posting = f"{title}\n\nWe need someone to own payroll analytics in Python and SQL.\n\nRequirements\n- Workday reporting"
+    assert app.normalize_job_desc(posting) == posting
+
+def test_sections_after_benefits_without_blank_lines_are_kept():
+    posting = ("Data Engineer\nWhat we offer\n- Free lunch\n- Gym membership\n"
+               "Requirements\n- Python and Airflow\nResponsibilities\n- Own the Kafka pipelines")
+    clean = app.normalize_job_desc(posting)
+    assert "Free lunch" not in clean
+    assert "Requirements\n- Python and Airflow\nResponsibilities\n- Own the Kafka pipelines" in clean
+
+def test_heading_must_be_the_whole_line():
+    posting = "Payroll Engineer\n\nCompensation systems you will build\n- Payroll engine in Go and Postgres"
+    assert app.normalize_job_desc(posting) == posting
+
+def test_benefits_and_eeo_are_dropped():
+    posting = ("Backend Engineer\n\nBuild billing services in Go, Postgres and Kafka for our payments platform.\n"
+               "- Design event-driven services\n- Own reliability and on-call\n\n"
+               "Benefits:\nHealth insurance and a learning budget.\n\n"
+               "We are an equal opportunity employer.")
+    clean = app.normalize_job_desc(posting)
+    assert "Health insurance" not in clean
+    assert "equal opportunity" not in clean
+    assert "Own reliability and on-call" in clean
+
+def test_posting_that_is_mostly_boilerplate_is_kept():
+    posting = "Analyst\n\nBenefits\nHealth insurance, dental and vision, 401k matching and unlimited paid time off"
+    assert app.normalize_job_desc(posting) == posting
+    assert app.job_index(app.normalize_job_desc(posting)).terms